@@ -0,0 +1,235 @@
+import argparse
+import gc
+import json
+import math
+import platform
+import sys
+import time
+
+import evaluation
+import incremental
+from connect import BOARD_BACKENDS, ConnectFourBoard, Play
+
+# Fixed positions as 1-based column sequences, like solver.py test sets.
+# forced_win positions are won for the player to move (player 2, the side
+# the search plays), as proved by solver.py.
+CORPUS = {
+    "opening": ["426", "53264"],
+    "midgame": ["6523563516772", "67646776252741736"],
+    "endgame": ["462321273264534546427133327", "7721534253257325264652337735117"],
+    "forced_win": [
+        "524366421613263457726",
+        "5215243745726531571",
+        "7642211461277437527631566",
+    ],
+}
+
+BOARD_FUNCTIONS = {
+    "win": lambda board: board.win(1) or board.win(2),
+    "gameOver": lambda board: board.gameOver(),
+    "isTerminal": lambda board: board.isTerminal(),
+    "getPossibleMoves": lambda board: board.getPossibleMoves(),
+}
+HEURISTICS = {
+    "heuristicEval1": evaluation.heuristicEval1,
+    "heuristicEval2": evaluation.heuristicEval2,
+    "heuristicEval3": evaluation.heuristicEval3,
+    "heuristicEval4": evaluation.heuristicEval4,
+    "reference.heuristicEval1": ConnectFourBoard.heuristicEval1,
+    "reference.heuristicEval2": ConnectFourBoard.heuristicEval2,
+    "reference.heuristicEval3": ConnectFourBoard.heuristicEval3,
+    "reference.heuristicEval4": ConnectFourBoard.heuristicEval4,
+    "incremental.heuristicEval1": incremental.heuristicEval1,
+    "incremental.heuristicEval3": incremental.heuristicEval3,
+    "FusedEvaluator": evaluation.FusedEvaluator(),
+}
+# What each benchmark is judged on when compared with a baseline
+METRICS = {"micro": "us_per_call", "macro": "seconds"}
+
+
+def boardFromMoves(moves, backend="bitboard"):
+    board = BOARD_BACKENDS[backend]()
+    for ply, col in enumerate(moves):
+        board.play(int(col) - 1, 1 if ply % 2 == 0 else 2)
+    return board
+
+
+def timed(fn):
+    # Seconds taken by fn() with the garbage collector off, as timeit does,
+    # so a collection set off by earlier allocations is not billed to fn
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        fn()
+        return time.perf_counter() - start
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def timeCalls(fn, repeat=5, minTime=0.02):
+    # Best time of one call over `repeat` runs of at least minTime seconds
+    number = 1
+
+    def run():
+        for _ in range(number):
+            fn()
+
+    while True:
+        elapsed = timed(run)
+        if elapsed >= minTime:
+            break
+        number *= 2
+    best = elapsed
+    for _ in range(repeat - 1):
+        best = min(best, timed(run))
+    return best / number
+
+
+def micro(backends=("numpy", "bitboard"), repeat=5):
+    # Microseconds per call of the board primitives and the heuristics, per
+    # backend and position category (one call covers every position of it)
+    results = {}
+    for backend in backends:
+        for category, sequences in CORPUS.items():
+            boards = [boardFromMoves(moves, backend) for moves in sequences]
+            for name, fn in BOARD_FUNCTIONS.items():
+
+                def calls(fn=fn):
+                    for board in boards:
+                        fn(board)
+
+                results[f"{backend}/{name}/{category}"] = {
+                    "us_per_call": timeCalls(calls, repeat) * 1e6 / len(boards)
+                }
+            for name, heuristic in HEURISTICS.items():
+
+                def calls(heuristic=heuristic):
+                    for board in boards:
+                        heuristic(board, 2)
+
+                results[f"{backend}/{name}/{category}"] = {
+                    "us_per_call": timeCalls(calls, repeat) * 1e6 / len(boards)
+                }
+    return results
+
+
+def macro(depths=range(3, 9), backend="bitboard", heuristic="FusedEvaluator", repeat=5):
+    # Fixed-depth minimaxAlphaBetaPruning from every corpus position, with a
+    # fresh Play (empty transposition table) for every run
+    results = {}
+    heuristic_function = HEURISTICS[heuristic]
+    for category, sequences in CORPUS.items():
+        for index, moves in enumerate(sequences):
+            for depth in depths:
+                best = None
+                for _ in range(repeat):
+                    board = boardFromMoves(moves, backend)
+                    play = Play(backend=backend)
+                    result = []
+
+                    def search():
+                        result[:] = play.minimaxAlphaBetaPruning(
+                            board,
+                            depth,
+                            float("-inf"),
+                            float("inf"),
+                            True,
+                            heuristic_function,
+                        )
+
+                    elapsed = timed(search)
+                    best = elapsed if best is None else min(best, elapsed)
+                move = result[1]
+                results[f"depth{depth}/{category}/{index}"] = {
+                    "nodes": play.nodes,
+                    "seconds": best,
+                    "nodes_per_second": play.nodes / best if best else 0.0,
+                    "move": list(move) if move else None,
+                }
+    return results
+
+
+def compare(results, baseline, threshold):
+    # Prints the change of every benchmark found in both runs and returns the
+    # ones that got more than threshold percent slower
+    regressions = []
+    for section, metric in METRICS.items():
+        old = baseline.get(section, {})
+        ratios = []
+        for key, entry in results.get(section, {}).items():
+            if key not in old or not old[key][metric]:
+                continue
+            change = entry[metric] / old[key][metric] - 1
+            ratios.append(change + 1)
+            note = ""
+            if section == "macro" and entry["nodes"] != old[key]["nodes"]:
+                # A different tree: the search changed, not only its speed
+                note = f" (nodes {old[key]['nodes']} -> {entry['nodes']})"
+            slower = change * 100 > threshold
+            if slower:
+                regressions.append((section, key, change))
+            print(f"{'SLOWER ' if slower else '       '}{key}: {change:+.1%}{note}")
+        if ratios:
+            mean = math.exp(sum(map(math.log, ratios)) / len(ratios))
+            print(f"{section}: {mean - 1:+.1%} geometric mean over {len(ratios)}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the board and search")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument(
+        "--baseline", help="earlier output to compare with; exits 1 on regressions"
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=10.0, help="allowed slowdown in percent"
+    )
+    parser.add_argument("--only", choices=METRICS)
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="runs per benchmark; the best counts"
+    )
+    parser.add_argument("--min-depth", type=int, default=3)
+    parser.add_argument("--max-depth", type=int, default=8)
+    parser.add_argument("--backend", choices=BOARD_BACKENDS, default="bitboard")
+    parser.add_argument("--heuristic", choices=HEURISTICS, default="FusedEvaluator")
+    args = parser.parse_args()
+    # Read first: a missing baseline fails before the run, and the output may
+    # replace it
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "backend": args.backend,
+            "heuristic": args.heuristic,
+        }
+    }
+    if args.only != "macro":
+        results["micro"] = micro(repeat=args.repeat)
+    if args.only != "micro":
+        results["macro"] = macro(
+            range(args.min_depth, args.max_depth + 1),
+            args.backend,
+            args.heuristic,
+            args.repeat,
+        )
+        for key, entry in results["macro"].items():
+            print(
+                f"{key}: {entry['nodes']} nodes, {entry['seconds'] * 1000:.2f} ms, "
+                f"{entry['nodes_per_second'] / 1000:.1f} K nodes/s"
+            )
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmarks more than {args.threshold}% slower")
+            sys.exit(1)
@@ -0,0 +1,110 @@
+# Bit layout shared by every bitboard in the project.
+#
+# Each column uses ROWS + 1 bits, bottom cell first. The extra bit on top of
+# every column stays empty so shifts never carry from one column into the next:
+#
+#   6 13 20 27 34 41 48
+#   5 12 19 26 33 40 47
+#   4 11 18 25 32 39 46
+#   3 10 17 24 31 38 45
+#   2  9 16 23 30 37 44
+#   1  8 15 22 29 36 43
+#   0  7 14 21 28 35 42
+#
+# Rows use the same orientation as the NumPy grid: row 0 is the top row.
+
+import numpy as np
+
+ROWS = 6
+COLS = 7
+H1 = ROWS + 1
+
+CELL_BITS = [
+    [1 << (col * H1 + ROWS - 1 - row) for col in range(COLS)] for row in range(ROWS)
+]
+BOTTOM_BITS = [1 << (col * H1) for col in range(COLS)]
+TOP_BITS = [1 << (col * H1 + ROWS - 1) for col in range(COLS)]
+COLUMN_MASKS = [((1 << ROWS) - 1) << (col * H1) for col in range(COLS)]
+
+BOTTOM_MASK = sum(BOTTOM_BITS)
+BOARD_MASK = BOTTOM_MASK * ((1 << ROWS) - 1)
+
+# Bit value of every flat cell index (row * COLS + col)
+CELL_WEIGHTS = np.array(
+    [CELL_BITS[row][col] for row in range(ROWS) for col in range(COLS)], dtype=np.int64
+)
+
+
+def hasFour(bits):
+    # Vertical
+    m = bits & (bits >> 1)
+    if m & (m >> 2):
+        return True
+    # Horizontal
+    m = bits & (bits >> H1)
+    if m & (m >> 2 * H1):
+        return True
+    # Diagonal (top-left to bottom-right)
+    m = bits & (bits >> (H1 - 1))
+    if m & (m >> 2 * (H1 - 1)):
+        return True
+    # Diagonal (bottom-left to top-right)
+    m = bits & (bits >> (H1 + 1))
+    if m & (m >> 2 * (H1 + 1)):
+        return True
+    return False
+
+
+def boardBits(board):
+    # Bitboards of any board object; the bitboard backend already has them
+    bits = getattr(board, "bits", None)
+    if bits is not None:
+        return bits, board.mask
+    cells = np.asarray(board.board).ravel()
+    bits = [
+        0,
+        int(CELL_WEIGHTS[cells == 1].sum()),
+        int(CELL_WEIGHTS[cells == 2].sum()),
+    ]
+    return bits, bits[1] | bits[2]
+
+
+def gridToBits(grid):
+    bits = [0, 0, 0]
+    for row in range(ROWS):
+        for col in range(COLS):
+            piece = int(grid[row][col])
+            if piece:
+                bits[piece] |= CELL_BITS[row][col]
+    return bits
+
+
+def mirrorBits(bits):
+    # Swap columns left to right
+    mirrored = 0
+    for col in range(COLS):
+        column = (bits >> (col * H1)) & ((1 << H1) - 1)
+        mirrored |= column << ((COLS - 1 - col) * H1)
+    return mirrored
+
+
+def positionKey(bits1, mask):
+    # Unique per position: within each column, mask + bottom leaves a single
+    # bit just above the top piece and player 1's pieces sit below it
+    return bits1 + mask + BOTTOM_MASK
+
+
+def canonicalKey(bits1, mask):
+    # (key, mirrored): one key for a position and its mirror image, and
+    # whether the given position is the mirrored one of the pair
+    key = positionKey(bits1, mask)
+    mirrored = positionKey(mirrorBits(bits1), mirrorBits(mask))
+    if mirrored < key:
+        return mirrored, True
+    return key, False
+
+
+def boardKey(board):
+    # canonicalKey of any board object
+    bits, mask = boardBits(board)
+    return canonicalKey(bits[1], mask)
@@ -0,0 +1 @@
+# Lets the tests import the root-level modules
@@ -1,6 +1,22 @@
 import numpy as np
 import random
 import copy
+import time
+
+import evaluation
+from bitboard import BOARD_MASK, CELL_BITS, gridToBits, hasFour
+from playouts import randomPlayouts
+from searchstats import SAMPLE_MASK, SearchStats
+from threats import threatMap
+from transposition import (
+    EXACT,
+    LOWER,
+    SIDE_KEY,
+    UPPER,
+    ZOBRIST,
+    TranspositionTable,
+    heuristicKey,
+)
 
 
 class ConnectFourBoard:
@@ -8,6 +24,13 @@ class ConnectFourBoard:
         self.rows = 6
         self.cols = 7
         self.board = np.zeros((self.rows, self.cols), dtype=int)
+        self.heights = [0] * self.cols
+        self.moveHistory = []
+        self.lastMove = None
+        self.moveCount = 0
+        self.hash = 0
+        # Incremental evaluators notified on every add/remove of a piece
+        self.observers = []
 
     def drawBoard(self):
         for row in self.board:
@@ -24,15 +47,85 @@ class ConnectFourBoard:
 
     def set_board(self, board):
         self.board = np.array(board)
+        self.heights = [int(n) for n in np.count_nonzero(self.board, axis=0)]
+        self.moveHistory = []
+        self.lastMove = None
+        self.moveCount = sum(self.heights)
+        self.hash = 0
+        for row, col in zip(*np.nonzero(self.board)):
+            self.hash ^= ZOBRIST[self.board[row, col]][row][col]
+        for observer in self.observers:
+            observer.rebuild(self)
 
     def resetBoard(self):
         self.board = np.zeros((self.rows, self.cols), dtype=int)
+        self.heights = [0] * self.cols
+        self.moveHistory = []
+        self.lastMove = None
+        self.moveCount = 0
+        self.hash = 0
+        for observer in self.observers:
+            observer.rebuild(self)
+
+    def addObserver(self, observer):
+        self.observers.append(observer)
 
     def getPossibleMoves(self):
-        return [col for col in range(self.cols) if self.board[0][col] == 0]
+        heights = self.heights
+        return [col for col in range(self.cols) if heights[col] < self.rows]
+
+    def play(self, col, piece):
+        # Drop a piece in col and return the row it landed on
+        if not 0 <= col < self.cols or self.heights[col] >= self.rows:
+            raise ValueError(f"Column {col} is not a legal move")
+        row = self.rows - 1 - self.heights[col]
+        self.board[row, col] = piece
+        self.heights[col] += 1
+        self.moveCount += 1
+        self.hash ^= ZOBRIST[piece][row][col]
+        self.lastMove = (row, col, piece)
+        self.moveHistory.append(self.lastMove)
+        for observer in self.observers:
+            observer.add(row, col, piece)
+        return row
+
+    def undo(self):
+        move = self.moveHistory.pop()
+        row, col, piece = move
+        self.board[row, col] = 0
+        self.heights[col] -= 1
+        self.moveCount -= 1
+        self.hash ^= ZOBRIST[piece][row][col]
+        self.lastMove = self.moveHistory[-1] if self.moveHistory else None
+        for observer in self.observers:
+            observer.remove(row, col, piece)
+        return move
 
     def makeMove(self, row, col, piece):
+        # Write a single cell. play()/undo() are the fast path for drops; this
+        # keeps the heights and move history right for callers that pass rows.
+        old = self.board[row, col]
+        occupied = old != 0
         self.board[row][col] = piece
+        self.hash ^= ZOBRIST[old][row][col] ^ ZOBRIST[piece][row][col]
+        if piece:
+            self.heights[col] = self.rows - row
+            if not occupied:
+                self.moveCount += 1
+                self.moveHistory.append((row, col, piece))
+            self.lastMove = (row, col, piece)
+        else:
+            self.heights[col] = self.rows - 1 - row
+            if occupied:
+                self.moveCount -= 1
+                if self.moveHistory and self.moveHistory[-1][:2] == (row, col):
+                    self.moveHistory.pop()
+            self.lastMove = self.moveHistory[-1] if self.moveHistory else None
+        for observer in self.observers:
+            if occupied:
+                observer.remove(row, col, old)
+            if piece:
+                observer.add(row, col, piece)
 
     def win(self, piece):
         # Check for a win horizontally
@@ -62,6 +155,34 @@ class ConnectFourBoard:
     def gameOver(self):
         return self.win(1) or self.win(2) or len(self.getPossibleMoves()) == 0
 
+    def winsAt(self, row, col, piece):
+        # Only the four lines through (row, col) can hold a new four
+        board = self.board
+        for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            count = 1
+            r, c = row + dr, col + dc
+            while 0 <= r < self.rows and 0 <= c < self.cols and board[r, c] == piece:
+                count += 1
+                r, c = r + dr, c + dc
+            r, c = row - dr, col - dc
+            while 0 <= r < self.rows and 0 <= c < self.cols and board[r, c] == piece:
+                count += 1
+                r, c = r - dr, c - dc
+            if count >= 4:
+                return True
+        return False
+
+    def isTerminal(self):
+        # Same answer as gameOver() for positions reached by legal play, but
+        # only looks at the lines through the last piece and uses the move
+        # count for draws. Falls back to the full scan when the last move is
+        # unknown (fresh set_board, or right after clearing a cell).
+        if self.lastMove is None:
+            return self.gameOver()
+        if self.moveCount == self.rows * self.cols:
+            return True
+        return self.winsAt(*self.lastMove)
+
     # heuristic 1
     def heuristicEval1(self, piece):
         score = 0
@@ -290,26 +411,149 @@ class ConnectFourBoard:
         return open_columns
 
     def threatAnalysisHeuristic(self, piece):
-        threats = 0
-        for row in range(self.rows):
-            for col in range(self.cols):
-                if self.board[row][col] == 0:
-                    # Check if placing a piece at this position creates a threat
-                    self.board[row][col] = piece
-                    if self.win(piece):
-                        threats += 1
-                    self.board[row][col] = 0  # Undo the move
-        return threats
+        # Empty cells where placing the piece would make four
+        return threatMap(self).count(piece)
+
+
+class ConnectFourBitboard(ConnectFourBoard):
+    # Same API as ConnectFourBoard, but win/gameOver/getPossibleMoves run on one
+    # integer bitboard per player plus an occupancy mask (which also encodes
+    # the column heights). The NumPy grid is kept in sync so the heuristics can
+    # keep reading self.board unchanged.
+    def __init__(self):
+        super().__init__()
+        self.bits = [0, 0, 0]
+        self.mask = 0
+
+    def set_board(self, board):
+        super().set_board(board)
+        self.bits = gridToBits(self.board)
+        self.mask = self.bits[1] | self.bits[2]
+
+    def resetBoard(self):
+        super().resetBoard()
+        self.bits = [0, 0, 0]
+        self.mask = 0
+
+    def play(self, col, piece):
+        row = super().play(col, piece)
+        bit = CELL_BITS[row][col]
+        self.bits[piece] |= bit
+        self.mask |= bit
+        return row
+
+    def undo(self):
+        move = super().undo()
+        row, col, piece = move
+        bit = CELL_BITS[row][col]
+        self.bits[piece] ^= bit
+        self.mask ^= bit
+        return move
+
+    def makeMove(self, row, col, piece):
+        super().makeMove(row, col, piece)
+        bit = CELL_BITS[row][col]
+        bits = self.bits
+        bits[1] &= ~bit
+        bits[2] &= ~bit
+        if piece:
+            bits[piece] |= bit
+            self.mask |= bit
+        else:
+            self.mask &= ~bit
+
+    def win(self, piece):
+        return hasFour(self.bits[piece])
+
+    def winsAt(self, row, col, piece):
+        # A full bitboard test is already cheaper than walking the four lines
+        return hasFour(self.bits[piece])
+
+    def gameOver(self):
+        return hasFour(self.bits[1]) or hasFour(self.bits[2]) or self.mask == BOARD_MASK
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+# Static move order: center column first, then outwards
+CENTER_ORDER = sorted(range(7), key=lambda col: abs(col - 3))
+CENTER_RANK = [CENTER_ORDER.index(col) for col in range(7)]
+
+
+BOARD_BACKENDS = {
+    "numpy": ConnectFourBoard,
+    "bitboard": ConnectFourBitboard,
+}
+
+# The reference heuristics score exactly like the vectorized ones, so they
+# share the batched versions
+BATCH_HEURISTICS = dict(evaluation.BATCH_HEURISTICS)
+BATCH_HEURISTICS.update(
+    {
+        ConnectFourBoard.heuristicEval1: evaluation.heuristicEval1Batch,
+        ConnectFourBoard.heuristicEval2: evaluation.heuristicEval2Batch,
+        ConnectFourBoard.heuristicEval3: evaluation.heuristicEval3Batch,
+        ConnectFourBoard.heuristicEval4: evaluation.heuristicEval4Batch,
+    }
+)
+
+
+def batchHeuristic(heuristic_function):
+    # Batched form of a heuristic: heuristic_batch(boards, piece) -> ndarray
+    batch = getattr(heuristic_function, "batch", None)
+    if batch is not None:
+        return batch
+    return BATCH_HEURISTICS.get(heuristic_function)
 
 
 class Play:
-    def __init__(self, mode="human_vs_computer"):
-        self.board = ConnectFourBoard()
+    def __init__(
+        self,
+        mode="human_vs_computer",
+        backend="numpy",
+        ttSizeMb=16,
+        ttReplacement="depth",
+        timeBudgetMs=1000,
+        moveOrdering=True,
+        batchLeaves=False,
+    ):
+        self.board = BOARD_BACKENDS[backend]()
+        # ttSizeMb=0 disables the transposition table
+        self.transpositionTable = (
+            TranspositionTable(ttSizeMb, ttReplacement) if ttSizeMb else None
+        )
         self.mode = mode
         self.player1_piece = 1
         self.player2_piece = 2
-        self.player1_heuristic = ConnectFourBoard.heuristicEval1
-        self.player2_heuristic = ConnectFourBoard.heuristicEval2
+        self.player1_heuristic = evaluation.heuristicEval1
+        self.player2_heuristic = evaluation.heuristicEval2
+        self.timeBudgetMs = timeBudgetMs
+        self.deadline = None
+        # threading.Event that aborts the search in progress when set
+        self.cancelEvent = None
+        self.moveOrdering = moveOrdering
+        # Score all children of depth-1 nodes with one batched heuristic call
+        self.batchLeaves = batchLeaves
+        self.newGame()
+        self.resetSearchStats()
+
+    def newGame(self):
+        # Killer moves per ply and the history table live for one game
+        rows, cols = self.board.rows, self.board.cols
+        self.killers = [[None, None] for _ in range(rows * cols + 1)]
+        self.historyTable = [[[0] * cols for _ in range(rows)] for _ in range(3)]
+
+    def resetSearchStats(self):
+        self.stats = SearchStats(self.board.rows * self.board.cols)
+
+    @property
+    def nodes(self):
+        return self.stats.nodes
+
+    def searchStats(self):
+        return self.stats.asDict()
 
     def humanTurn(self):
         print("Human's turn!!!")
@@ -320,31 +564,28 @@ class Play:
             print("Invalid move. Try again.")
             self.humanTurn()
         else:
-            row = max(
-                [r for r in range(self.board.rows) if self.board.board[r][col] == 0]
-            )
-            self.board.makeMove(row, col, self.player1_piece)
+            self.board.play(col, self.player1_piece)
 
     def computerTurn(self, player_piece, player_heuristic):
         print("Player's turn!!!")
-        _, move = self.minimaxAlphaBetaPruning(
-            self.board, 5, float("-inf"), float("inf"), True, player_heuristic
+        _, move, _ = self.iterativeDeepening(
+            self.board, self.timeBudgetMs, player_heuristic
         )
-        self.board.makeMove(move[0], move[1], player_piece)
+        self.board.play(move[1], player_piece)
 
     def play(self):
-        while not self.board.gameOver():
+        while not self.board.isTerminal():
             self.board.drawBoard()
             if self.mode == "1":
                 print("human_vs_computer")
                 self.humanTurn()
-                if not self.board.gameOver():
+                if not self.board.isTerminal():
                     self.board.drawBoard()
                     self.computerTurn(self.player2_piece, self.player2_heuristic)
             elif self.mode == "2":
                 print("computer_vs_computer")
                 self.computerTurn(self.player1_piece, self.player1_heuristic)
-                if not self.board.gameOver():
+                if not self.board.isTerminal():
                     self.board.drawBoard()
                     self.computerTurn(self.player2_piece, self.player2_heuristic)
 
@@ -356,87 +597,250 @@ class Play:
         else:
             print("It's a draw!")
 
-    def minimaxAlphaBetaPruning(
-        self, board, depth, alpha, beta, maximizingPlayer, heuristic_function
+    def iterativeDeepening(
+        self, board, timeBudgetMs, heuristic_function, maxDepth=None
     ):
-        if depth == 0 or board.gameOver():
-            return heuristic_function(board, 2), None
+        # Search depth 1, 2, ... until the budget runs out and return
+        # (eval, move, stats) from the deepest depth that completed; stats is
+        # the SearchStats of the whole search. Depth 1 always completes, so
+        # there is always a move to play.
+        if maxDepth is None:
+            maxDepth = board.rows * board.cols - board.moveCount
+        start = time.perf_counter()
+        self.resetSearchStats()
+        stats = self.stats
+        ply = len(board.moveHistory)
+        result = (heuristic_function(board, 2), None)
+        try:
+            for depth in range(1, maxDepth + 1):
+                nodes = stats.nodes
+                eval, move = self.minimaxAlphaBetaPruning(
+                    board,
+                    depth,
+                    float("-inf"),
+                    float("inf"),
+                    True,
+                    heuristic_function,
+                    firstMove=result[1][1] if result[1] else None,
+                )
+                result = (eval, move)
+                stats.depth = depth
+                stats.iterationNodes.append(stats.nodes - nodes)
+                if move is None:
+                    break
+                self.deadline = start + timeBudgetMs / 1000
+        except SearchTimeout:
+            stats.interrupted = True
+            # Unwind the moves the aborted iteration left on the board
+            while len(board.moveHistory) > ply:
+                board.undo()
+        finally:
+            self.deadline = None
+            stats.elapsed = time.perf_counter() - start
+        return result[0], result[1], stats
 
+    def minimaxAlphaBetaPruning(
+        self,
+        board,
+        depth,
+        alpha,
+        beta,
+        maximizingPlayer,
+        heuristic_function,
+        firstMove=None,
+        ply=0,
+    ):
+        stats = self.stats
+        stats.nodes += 1
+        if ply > stats.maxPly:
+            stats.maxPly = ply
+        # Sampled nodes check the deadline and time their parts
+        sample = not stats.nodes & SAMPLE_MASK
+        if sample:
+            if (self.deadline is not None and time.perf_counter() > self.deadline) or (
+                self.cancelEvent is not None and self.cancelEvent.is_set()
+            ):
+                raise SearchTimeout()
+            stats.samples += 1
+            clock = time.perf_counter()
+
+        if depth == 0 or board.isTerminal():
+            stats.leaves += 1
+            if not sample:
+                return heuristic_function(board, 2), None
+            now = time.perf_counter()
+            stats.terminalTime += now - clock
+            value = heuristic_function(board, 2)
+            stats.heuristicTime += time.perf_counter() - now
+            return value, None
+        if sample:
+            stats.terminalTime += time.perf_counter() - clock
+
+        ttCol = None
+        table = self.transpositionTable
+        if table is not None:
+            key = board.hash ^ heuristicKey(heuristic_function)
+            if maximizingPlayer:
+                key ^= SIDE_KEY
+            entry = table.probe(key)
+            stats.ttProbes += 1
+            if entry is not None:
+                stats.ttHits += 1
+            if entry is not None and entry[1] >= depth:
+                _, _, flag, value, move = entry
+                if flag == EXACT:
+                    stats.ttCutoffs += 1
+                    return value, move
+                if flag == LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if beta <= alpha:
+                    stats.ttCutoffs += 1
+                    return value, move
+            if entry is not None and entry[4] is not None:
+                ttCol = entry[4][1]
+            alphaOrig, betaOrig = alpha, beta
+
+        piece = 2 if maximizingPlayer else 1
+        if sample:
+            clock = time.perf_counter()
         possible_moves = board.getPossibleMoves()
-
-        if maximizingPlayer:
-            maxEval = float("-inf")
+        if self.moveOrdering:
+            possible_moves = self.orderMoves(
+                board, possible_moves, piece, ply, ttCol, firstMove
+            )
+        elif firstMove in possible_moves:
+            # Best move of the previous iteration goes first
+            possible_moves.remove(firstMove)
+            possible_moves.insert(0, firstMove)
+        if sample:
+            stats.moveGenerationTime += time.perf_counter() - clock
+
+        batch = self.batchLeaves and depth == 1 and batchHeuristic(heuristic_function)
+        if batch:
+            bestEval, bestMove = self.evaluateFrontier(
+                board, possible_moves, piece, maximizingPlayer, batch
+            )
+        elif maximizingPlayer:
+            bestEval = float("-inf")
             bestMove = None
-            for col in possible_moves:
-                row = max([r for r in range(board.rows) if board.board[r][col] == 0])
-                board.makeMove(row, col, 2)
+            for i, col in enumerate(possible_moves):
+                row = board.play(col, 2)
                 eval, _ = self.minimaxAlphaBetaPruning(
-                    board, depth - 1, alpha, beta, False, heuristic_function
+                    board,
+                    depth - 1,
+                    alpha,
+                    beta,
+                    False,
+                    heuristic_function,
+                    ply=ply + 1,
                 )
-                board.makeMove(row, col, 0)
-                if eval > maxEval:
-                    maxEval = eval
+                board.undo()
+                if eval > bestEval:
+                    bestEval = eval
                     bestMove = (row, col)
                 alpha = max(alpha, eval)
                 if beta <= alpha:
+                    self.recordCutoff(i, ply, 2, row, col, depth)
                     break
-            return maxEval, bestMove
         else:
-            minEval = float("inf")
+            bestEval = float("inf")
             bestMove = None
-            for col in possible_moves:
-                row = max([r for r in range(board.rows) if board.board[r][col] == 0])
-                board.makeMove(row, col, 1)
+            for i, col in enumerate(possible_moves):
+                row = board.play(col, 1)
                 eval, _ = self.minimaxAlphaBetaPruning(
-                    board, depth - 1, alpha, beta, True, heuristic_function
+                    board,
+                    depth - 1,
+                    alpha,
+                    beta,
+                    True,
+                    heuristic_function,
+                    ply=ply + 1,
                 )
-                board.makeMove(row, col, 0)
-                if eval < minEval:
-                    minEval = eval
+                board.undo()
+                if eval < bestEval:
+                    bestEval = eval
                     bestMove = (row, col)
                 beta = min(beta, eval)
                 if beta <= alpha:
+                    self.recordCutoff(i, ply, 1, row, col, depth)
                     break
-            return minEval, bestMove
-
-    # def monteCarlo(self, simulations=1000):
-    #     current_player = 2  # Assuming computer plays first
-    #     best_score = float("-inf")
-    #     best_move = None
-
-    #     for col in self.board.getPossibleMoves():
-    #         row = max(
-    #             [r for r in range(self.board.rows) if self.board.board[r][col] == 0]
-    #         )
-    #         self.board.makeMove(row, col, current_player)
-    #         total_score = 0
-
-    #         for _ in range(simulations):
-    #             temp_board = copy.deepcopy(self.board)  # Make a copy for simulation
-    #             total_score += self.simulateRandomGame(temp_board, current_player)
-
-    #         average_score = total_score / simulations
-
-    #         if average_score > best_score:
-    #             best_score = average_score
-    #             best_move = (row, col)
-
-    #         self.board.makeMove(row, col, 0)  # Undo the move for next iteration
-
-    #     return best_move
-
-    # def simulateRandomGame(self, board, current_player):
-    #     while not board.gameOver():
-    #         possible_moves = board.getPossibleMoves()
-    #         random_move = random.choice(possible_moves)
-    #         row = max(
-    #             [r for r in range(board.rows) if board.board[r][random_move] == 0]
-    #         )
-    #         board.makeMove(row, random_move, current_player)
-    #         current_player = 3 - current_player  # Switch player (1 to 2, or 2 to 1)
-    #     if board.win(2):  # Assuming computer is player 2
-    #         return 1  # Computer wins
-    #     elif board.win(1):
-    #         return -1  # Human wins
-    #     else:
-    #         return 0  # It's a draw
+
+        if table is not None:
+            if bestEval <= alphaOrig:
+                flag = UPPER
+            elif bestEval >= betaOrig:
+                flag = LOWER
+            else:
+                flag = EXACT
+            table.store(key, depth, flag, bestEval, bestMove)
+
+        return bestEval, bestMove
+
+    def evaluateFrontier(self, board, moves, piece, maximizingPlayer, batch):
+        # Stack every child position into one (n, rows, cols) array and score
+        # them with a single call. The exact min/max is at least as tight as
+        # what the per-child loop would return after a cutoff.
+        n = len(moves)
+        rows = [board.rows - 1 - board.heights[col] for col in moves]
+        children = np.repeat(board.board[np.newaxis], n, axis=0)
+        children[np.arange(n), rows, moves] = piece
+        scores = batch(children, 2)
+        best = int(scores.argmax() if maximizingPlayer else scores.argmin())
+        self.stats.nodes += n
+        self.stats.leaves += n
+        return scores[best].item(), (rows[best], moves[best])
+
+    def orderMoves(self, board, moves, piece, ply, ttCol, firstMove):
+        # Previous iteration's best move, then the TT move, then this ply's
+        # killers, then by history score; ties are broken center-out
+        killers = self.killers[ply]
+        history = self.historyTable[piece]
+        heights = board.heights
+        bottom = board.rows - 1
+        scored = []
+        for col in moves:
+            if col == firstMove:
+                score = 4 << 40
+            elif col == ttCol:
+                score = 3 << 40
+            elif col == killers[0]:
+                score = 2 << 40
+            elif col == killers[1]:
+                score = 1 << 40
+            else:
+                score = history[bottom - heights[col]][col]
+            scored.append((-score, CENTER_RANK[col], col))
+        scored.sort()
+        return [col for _, _, col in scored]
+
+    def recordCutoff(self, index, ply, piece, row, col, depth):
+        self.stats.cutoffs[ply] += 1
+        if index == 0:
+            self.stats.firstMoveCutoffs += 1
+        killers = self.killers[ply]
+        if killers[0] != col:
+            killers[1] = killers[0]
+            killers[0] = col
+        self.historyTable[piece][row][col] += depth * depth
+
+    def monteCarlo(self, simulations=1000):
+        # Flat Monte Carlo for the computer (player 2): every candidate column
+        # gets `simulations` random games, all played out in one batch
+        moves = self.board.getPossibleMoves()
+        rows = []
+        boards = []
+        for col in moves:
+            row = self.board.play(col, 2)
+            won = self.board.winsAt(row, col, 2)
+            boards.append(self.board.board.copy())
+            self.board.undo()
+            if won:
+                return row, col
+            rows.append(row)
+        batch = np.repeat(np.array(boards, dtype=np.int8), simulations, axis=0)
+        winners = randomPlayouts(batch, 1).reshape(len(moves), simulations)
+        scores = (winners == 2).mean(axis=1) - (winners == 1).mean(axis=1)
+        best = int(scores.argmax())
+        return rows[best], moves[best]
@@ -0,0 +1,341 @@
+from operator import mul
+
+import numpy as np
+
+from bitboard import BOARD_MASK, CELL_BITS, COLUMN_MASKS, H1, TOP_BITS, boardBits
+from threats import popcount, threatMap, winningCells
+
+ROWS = 6
+COLS = 7
+
+
+def windowIndex(length):
+    # Flat cell indices (row * COLS + col) of every run of `length` cells, in
+    # the same direction order as ConnectFourBoard.countConsecutive
+    windows = []
+    # Horizontal
+    for row in range(ROWS):
+        for col in range(COLS - length + 1):
+            windows.append([row * COLS + col + i for i in range(length)])
+    # Vertical
+    for row in range(ROWS - length + 1):
+        for col in range(COLS):
+            windows.append([(row + i) * COLS + col for i in range(length)])
+    # Diagonal (bottom-left to top-right)
+    for row in range(length - 1, ROWS):
+        for col in range(COLS - length + 1):
+            windows.append([(row - i) * COLS + col + i for i in range(length)])
+    # Diagonal (top-left to bottom-right)
+    for row in range(ROWS - length + 1):
+        for col in range(COLS - length + 1):
+            windows.append([(row + i) * COLS + col + i for i in range(length)])
+    return np.array(windows, dtype=np.intp)
+
+
+# Every four-cell window of the board, shape (69, 4)
+WINDOWS = windowIndex(4)
+RUNS = {length: windowIndex(length) for length in (2, 3)}
+# First and last cell of every window
+WINDOW_ENDS = WINDOWS[:, [0, 3]]
+
+CENTER_CELLS = np.array([row * COLS + col for row in range(ROWS) for col in (2, 3, 4)])
+CORNER_CELLS = np.array([0, COLS - 1, (ROWS - 1) * COLS, ROWS * COLS - 1])
+TOP_CELLS = np.arange(COLS)
+
+
+# heuristic 1
+def heuristicEval1(board, piece):
+    own = board.board.ravel() == piece
+    score = 250 * int(own[WINDOWS].all(1).sum())  # Four in a row
+    score += 90 * int(own[RUNS[3]].all(1).sum())  # Three in a row
+    score += 10 * int(own[RUNS[2]].all(1).sum())  # Two in a row
+    score += 3 * 4 * int(own.sum())  # One in a row, counted once per direction
+    return score
+
+
+# heuristic 2
+def heuristicEval2(board, piece):
+    cells = board.board.ravel()
+    opponent_piece = 1 if piece == 2 else 2
+    # Windows whose two end cells both hold the piece
+    ends = cells[WINDOW_ENDS]
+    own_threats = 10 * int((ends == piece).all(1).sum())
+    opponent_threats = 200 * int((ends == opponent_piece).all(1).sum())
+    return own_threats - opponent_threats
+
+
+# heuristic 3
+def heuristicEval3(board, piece):
+    windows = board.board.ravel()[WINDOWS]
+    own = windows == piece
+    # Windows not touched by the opponent score one point per own piece
+    open_windows = (own | (windows == 0)).all(1)
+    return int(own.sum(1)[open_windows].sum())
+
+
+# heuristic 4
+def heuristicEval4(board, piece):
+    cells = board.board.ravel()
+    weights = {
+        "center_control": 1.0,
+        "mobility": 1.0,
+        "block_threats": 1.0,
+        "corner_control": 1.0,
+        "piece_count": 1.0,
+        "connectivity": 1.0,
+        "open_columns": 1.0,
+        "threat_analysis": 1.0,
+    }
+
+    pieces = int(np.count_nonzero(cells))
+    if pieces < 8:
+        weights["center_control"] = 2.0
+        weights["open_columns"] = 0.5
+    if pieces > 12:
+        weights["connectivity"] = 2
+        weights["block_threats"] = 1.5
+
+    own = cells == piece
+    opponent_piece = 1 if piece == 2 else 2
+    open_columns = int((cells[TOP_CELLS] == 0).sum())
+
+    score = 0
+    score += weights["center_control"] * int(own[CENTER_CELLS].sum())
+    score += weights["mobility"] * open_columns
+    score += weights["block_threats"] * -int(
+        (cells[RUNS[3]] == opponent_piece).all(1).sum()
+    )
+    score += weights["corner_control"] * int(own[CORNER_CELLS].sum())
+    score += weights["piece_count"] * int(own.sum())
+    score += weights["connectivity"] * int(own[WINDOWS].all(1).sum())
+    score += weights["open_columns"] * open_columns
+    score += weights["threat_analysis"] * threatMap(board).count(piece)
+    return score
+
+
+# Batched versions: boards is an (n, ROWS, COLS) stack, the result holds one
+# score per board and matches the single-board function above.
+def heuristicEval1Batch(boards, piece):
+    own = boards.reshape(len(boards), -1) == piece
+    score = 250 * own[:, WINDOWS].all(2).sum(1)
+    score += 90 * own[:, RUNS[3]].all(2).sum(1)
+    score += 10 * own[:, RUNS[2]].all(2).sum(1)
+    score += 3 * 4 * own.sum(1)
+    return score
+
+
+def heuristicEval2Batch(boards, piece):
+    ends = boards.reshape(len(boards), -1)[:, WINDOW_ENDS]
+    opponent_piece = 1 if piece == 2 else 2
+    own_threats = 10 * (ends == piece).all(2).sum(1)
+    opponent_threats = 200 * (ends == opponent_piece).all(2).sum(1)
+    return own_threats - opponent_threats
+
+
+def heuristicEval3Batch(boards, piece):
+    windows = boards.reshape(len(boards), -1)[:, WINDOWS]
+    own = windows == piece
+    open_windows = (own | (windows == 0)).all(2)
+    return (own.sum(2) * open_windows).sum(1)
+
+
+def heuristicEval4Batch(boards, piece):
+    cells = boards.reshape(len(boards), -1)
+    pieces = np.count_nonzero(cells, axis=1)
+    early = pieces < 8
+    late = pieces > 12
+
+    own = cells == piece
+    opponent_piece = 1 if piece == 2 else 2
+    open_columns = (cells[:, TOP_CELLS] == 0).sum(1)
+
+    score = np.where(early, 2.0, 1.0) * own[:, CENTER_CELLS].sum(1)
+    score += open_columns
+    score += np.where(late, 1.5, 1.0) * -(cells[:, RUNS[3]] == opponent_piece).all(
+        2
+    ).sum(1)
+    score += own[:, CORNER_CELLS].sum(1)
+    score += own.sum(1)
+    score += np.where(late, 2.0, 1.0) * own[:, WINDOWS].all(2).sum(1)
+    score += np.where(early, 0.5, 1.0) * open_columns
+    score += threatCountBatch(cells, piece)
+    return score
+
+
+def threatCountBatch(cells, piece):
+    # Empty cells that would give `piece` a four anywhere on the board, which
+    # is every empty cell once the piece has already won
+    counts = (cells == piece)[:, WINDOWS].sum(2)
+    empty = cells == 0
+    # Empty cell of every window that already holds three of the piece
+    board_index, window, slot = np.nonzero(
+        (counts == 3)[:, :, None] & empty[:, WINDOWS]
+    )
+    threats = np.zeros(cells.shape, dtype=bool)
+    threats[board_index, WINDOWS[window, slot]] = True
+    return np.where((counts == 4).any(1), empty.sum(1), threats.sum(1))
+
+
+BATCH_HEURISTICS = {
+    heuristicEval1: heuristicEval1Batch,
+    heuristicEval2: heuristicEval2Batch,
+    heuristicEval3: heuristicEval3Batch,
+    heuristicEval4: heuristicEval4Batch,
+}
+
+# Feature order of FusedEvaluator, with the heuristicEval4 weights
+FEATURES = (
+    "center_control",
+    "mobility",
+    "block_threats",
+    "corner_control",
+    "piece_count",
+    "connectivity",
+    "open_columns",
+    "threat_analysis",
+)
+EARLY_GAME_WEIGHTS = {"center_control": 2.0, "open_columns": 0.5}
+LATE_GAME_WEIGHTS = {"connectivity": 2, "block_threats": 1.5}
+
+CENTER_MASK = COLUMN_MASKS[2] | COLUMN_MASKS[3] | COLUMN_MASKS[4]
+CORNER_MASK = CELL_BITS[0][0] | CELL_BITS[0][6] | CELL_BITS[5][0] | CELL_BITS[5][6]
+TOP_MASK = sum(TOP_BITS)
+
+
+def runCount(bits, length):
+    # Same as countConsecutive for runs of 3 or 4 pieces, in all four directions
+    total = 0
+    for shift in (1, H1, H1 - 1, H1 + 1):
+        pair = bits & (bits >> shift)
+        if length == 3:
+            total += (pair & (bits >> 2 * shift)).bit_count()
+        else:
+            total += (pair & (pair >> 2 * shift)).bit_count()
+    return total
+
+
+class FusedEvaluator:
+    # heuristicEval4 in one pass: the eight features come straight from the
+    # bitboards into one vector, then the weights of the game phase (early,
+    # middle, late) are applied as a dot product. Weights are fixed when the
+    # evaluator is built; the defaults reproduce heuristicEval4 exactly.
+    def __init__(self, weights=None, earlyWeights=None, lateWeights=None):
+        middle = dict.fromkeys(FEATURES, 1.0)
+        middle.update(weights or {})
+        early = dict(middle, **EARLY_GAME_WEIGHTS)
+        early.update(earlyWeights or {})
+        late = dict(middle, **LATE_GAME_WEIGHTS)
+        late.update(lateWeights or {})
+        self.phaseWeights = tuple(
+            tuple(phase[name] for name in FEATURES) for phase in (early, middle, late)
+        )
+        self.weightMatrix = np.array(self.phaseWeights, dtype=float)
+        # Tells transposition tables apart evaluators with different weights
+        self.key = "FusedEvaluator%r" % (self.phaseWeights,)
+
+    def features(self, board, piece):
+        # Returns (feature vector, phase index)
+        bits, mask = boardBits(board)
+        own = bits[piece]
+        opponent = bits[3 - piece]
+        open_columns = COLS - popcount(mask & TOP_MASK)
+        connectivity = runCount(own, 4)
+        empty = BOARD_MASK & ~mask
+        # With four already on the board every empty cell counts as a threat
+        threats = empty if connectivity else winningCells(own) & empty
+        pieces = popcount(mask)
+        phase = 0 if pieces < 8 else 2 if pieces > 12 else 1
+        return (
+            popcount(own & CENTER_MASK),
+            open_columns,
+            -runCount(opponent, 3),
+            popcount(own & CORNER_MASK),
+            popcount(own),
+            connectivity,
+            open_columns,
+            popcount(threats),
+        ), phase
+
+    def __call__(self, board, piece):
+        features, phase = self.features(board, piece)
+        return sum(map(mul, self.phaseWeights[phase], features))
+
+    def batchFeatures(self, boards, piece):
+        # (n, 8) feature matrix and (n,) phase indices for a stack of boards
+        cells = boards.reshape(len(boards), -1)
+        pieces = np.count_nonzero(cells, axis=1)
+        own = cells == piece
+        opponent = cells == 3 - piece
+        open_columns = (cells[:, TOP_CELLS] == 0).sum(1)
+        features = np.stack(
+            [
+                own[:, CENTER_CELLS].sum(1),
+                open_columns,
+                -opponent[:, RUNS[3]].all(2).sum(1),
+                own[:, CORNER_CELLS].sum(1),
+                own.sum(1),
+                own[:, WINDOWS].all(2).sum(1),
+                open_columns,
+                threatCountBatch(cells, piece),
+            ],
+            axis=1,
+        )
+        phases = np.where(pieces < 8, 0, np.where(pieces > 12, 2, 1))
+        return features, phases
+
+    def batch(self, boards, piece):
+        features, phases = self.batchFeatures(boards, piece)
+        return (features * self.weightMatrix[phases]).sum(1)
+
+
+class RunsEvaluator:
+    # heuristicEval1 with the weights of fours, threes, twos and single
+    # pieces as parameters; t.py uses (250, 50, 10, 3), try.py (300, 100, 10, 3)
+    def __init__(self, weights=(250, 90, 10, 3)):
+        self.weights = tuple(weights)
+        self.key = "RunsEvaluator%r" % (self.weights,)
+
+    def __call__(self, board, piece):
+        four, three, two, one = self.weights
+        own = board.board.ravel() == piece
+        score = four * int(own[WINDOWS].all(1).sum())
+        score += three * int(own[RUNS[3]].all(1).sum())
+        score += two * int(own[RUNS[2]].all(1).sum())
+        score += one * 4 * int(own.sum())
+        return score
+
+    def batch(self, boards, piece):
+        four, three, two, one = self.weights
+        own = boards.reshape(len(boards), -1) == piece
+        score = four * own[:, WINDOWS].all(2).sum(1)
+        score += three * own[:, RUNS[3]].all(2).sum(1)
+        score += two * own[:, RUNS[2]].all(2).sum(1)
+        score += one * 4 * own.sum(1)
+        return score
+
+
+class EndsEvaluator:
+    # heuristicEval2 with the own and opponent weights as parameters; t.py
+    # and try.py weigh the opponent's windows 20 instead of 200
+    def __init__(self, own=10, opponent=200):
+        self.own = own
+        self.opponent = opponent
+        self.key = "EndsEvaluator%r" % ((own, opponent),)
+
+    def __call__(self, board, piece):
+        ends = board.board.ravel()[WINDOW_ENDS]
+        own_threats = self.own * int((ends == piece).all(1).sum())
+        opponent_threats = self.opponent * int((ends == 3 - piece).all(1).sum())
+        return own_threats - opponent_threats
+
+    def batch(self, boards, piece):
+        ends = boards.reshape(len(boards), -1)[:, WINDOW_ENDS]
+        own_threats = self.own * (ends == piece).all(2).sum(1)
+        opponent_threats = self.opponent * (ends == 3 - piece).all(2).sum(1)
+        return own_threats - opponent_threats
+
+
+# heuristicEval4 of try.py: playable threats of the piece minus the opponent's
+def threatBalance(board, piece):
+    threats = threatMap(board)
+    return threats.playableCount(piece) - threats.playableCount(3 - piece)
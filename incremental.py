@@ -0,0 +1,113 @@
+from evaluation import COLS, ROWS, RUNS, WINDOWS
+
+# Windows / runs that contain each flat cell index
+CELL_WINDOWS = [[] for _ in range(ROWS * COLS)]
+for window, cells in enumerate(WINDOWS.tolist()):
+    for cell in cells:
+        CELL_WINDOWS[cell].append(window)
+CELL_RUNS = {}
+for length, runs in RUNS.items():
+    CELL_RUNS[length] = [[] for _ in range(ROWS * COLS)]
+    for run, cells in enumerate(runs.tolist()):
+        for cell in cells:
+            CELL_RUNS[length][cell].append(run)
+
+
+class WindowCounts:
+    # Piece counts per four-cell window for both players, updated by the board
+    # on every play/undo. Keeps the heuristicEval3 score and the
+    # countConsecutive totals as running values, so reading them is free.
+    def __init__(self, board):
+        self.rebuild(board)
+
+    def rebuild(self, board):
+        self.counts = [[0] * len(WINDOWS) for _ in range(3)]
+        self.runCounts = [
+            {length: [0] * len(runs) for length, runs in RUNS.items()} for _ in range(3)
+        ]
+        # consecutive[piece][length] == countConsecutive(piece, length)
+        self.consecutive = [[0] * 5 for _ in range(3)]
+        self.score3 = [0, 0, 0]
+        for row in range(ROWS):
+            for col in range(COLS):
+                piece = int(board.board[row][col])
+                if piece:
+                    self.add(row, col, piece)
+
+    def add(self, row, col, piece):
+        cell = row * COLS + col
+        own = self.counts[piece]
+        other = self.counts[3 - piece]
+        score3 = self.score3
+        for window in CELL_WINDOWS[cell]:
+            if other[window] == 0:
+                # Still an open window for piece: one more point
+                score3[piece] += 1
+            elif own[window] == 0:
+                # The opponent's open window is now blocked
+                score3[3 - piece] -= other[window]
+            own[window] += 1
+            if own[window] == 4:
+                self.consecutive[piece][4] += 1
+        consecutive = self.consecutive[piece]
+        for length, cellRuns in CELL_RUNS.items():
+            runCounts = self.runCounts[piece][length]
+            for run in cellRuns[cell]:
+                runCounts[run] += 1
+                if runCounts[run] == length:
+                    consecutive[length] += 1
+        # A single piece is a run of one in each of the four directions
+        consecutive[1] += 4
+
+    def remove(self, row, col, piece):
+        cell = row * COLS + col
+        own = self.counts[piece]
+        other = self.counts[3 - piece]
+        score3 = self.score3
+        for window in CELL_WINDOWS[cell]:
+            if own[window] == 4:
+                self.consecutive[piece][4] -= 1
+            own[window] -= 1
+            if other[window] == 0:
+                score3[piece] -= 1
+            elif own[window] == 0:
+                # The opponent's window opens up again
+                score3[3 - piece] += other[window]
+        consecutive = self.consecutive[piece]
+        for length, cellRuns in CELL_RUNS.items():
+            runCounts = self.runCounts[piece][length]
+            for run in cellRuns[cell]:
+                if runCounts[run] == length:
+                    consecutive[length] -= 1
+                runCounts[run] -= 1
+        consecutive[1] -= 4
+
+    def features(self, piece):
+        # countConsecutive(piece, n) for n = 1..4
+        return self.consecutive[piece][1:]
+
+
+def windowCounts(board):
+    # Attach the running counts to the board the first time it is evaluated
+    try:
+        return board.windowCounts
+    except AttributeError:
+        counts = WindowCounts(board)
+        board.windowCounts = counts
+        board.addObserver(counts)
+        return counts
+
+
+# Drop-in replacements for the heuristic slot in Play
+def heuristicEval1(board, piece):
+    consecutive = windowCounts(board).consecutive[piece]
+    return (
+        250 * consecutive[4]
+        + 90 * consecutive[3]
+        + 10 * consecutive[2]
+        + 3 * consecutive[1]
+    )
+
+
+def heuristicEval3(board, piece):
+    return windowCounts(board).score3[piece]
@@ -0,0 +1,325 @@
+import math
+import random
+import time
+
+import numpy as np
+
+from bitboard import (
+    BOTTOM_BITS,
+    COLS,
+    COLUMN_MASKS,
+    ROWS,
+    TOP_BITS,
+    boardBits,
+    hasFour,
+)
+from connect import CENTER_ORDER
+from playouts import bitsToGrids, randomPlayouts
+
+SIZE = ROWS * COLS
+# PUCT prior: center columns take part in more fours
+PRIOR_WEIGHTS = [1, 2, 3, 4, 3, 2, 1]
+
+
+class MCTS:
+    # Monte Carlo tree search over (current, mask) bitboards as in solver.py:
+    # current holds the stones of the player to move. Nodes live in a pool of
+    # parallel lists indexed by node number; a node's value is counted for
+    # the player who made the move leading to it (win 1, draw 0.5). The tree
+    # is kept between moves and re-rooted at the position searched next.
+    def __init__(
+        self,
+        exploration=1.4,
+        policy="uct",
+        capacity=500000,
+        seed=None,
+        rollouts="python",
+        batchSize=256,
+        leafPlayouts=1,
+    ):
+        if policy not in ("uct", "puct"):
+            raise ValueError("policy must be 'uct' or 'puct'")
+        if rollouts not in ("python", "numpy"):
+            raise ValueError("rollouts must be 'python' or 'numpy'")
+        self.exploration = exploration
+        self.policy = policy
+        self.capacity = capacity
+        self.rng = random.Random(seed)
+        self.npRng = np.random.default_rng(seed)
+        # "numpy" plays leaves out batchSize at a time with playouts.py, each
+        # one leafPlayouts times
+        self.rollouts = rollouts
+        self.batchSize = batchSize
+        self.leafPlayouts = leafPlayouts
+        self.reset()
+        self.resetSearchStats()
+
+    def reset(self):
+        self.parent = []
+        self.move = []
+        self.children = []
+        self.visits = []
+        self.value = []
+        self.prior = []
+        # Result for the player who moved into the node, None if not over
+        self.terminal = []
+        self.root = None
+        self.rootPosition = None
+
+    def resetSearchStats(self):
+        self.playouts = 0
+        self.elapsed = 0.0
+        self.reusedVisits = 0
+
+    def searchStats(self):
+        return {
+            "playouts": self.playouts,
+            "elapsed": self.elapsed,
+            "playouts_per_second": (
+                self.playouts / self.elapsed if self.elapsed else 0.0
+            ),
+            "tree_nodes": len(self.visits),
+            "reused_visits": self.reusedVisits,
+        }
+
+    def _newNode(self, parent, move, prior, terminal):
+        self.parent.append(parent)
+        self.move.append(move)
+        self.children.append(None)
+        self.visits.append(0)
+        self.value.append(0.0)
+        self.prior.append(prior)
+        self.terminal.append(terminal)
+        return len(self.visits) - 1
+
+    def _expand(self, node, current, mask, moves):
+        legal = [col for col in CENTER_ORDER if not mask & TOP_BITS[col]]
+        total = sum(PRIOR_WEIGHTS[col] for col in legal)
+        children = []
+        for col in legal:
+            bit = (mask + BOTTOM_BITS[col]) & COLUMN_MASKS[col]
+            if hasFour(current | bit):
+                terminal = 1.0
+            elif moves + 1 == SIZE:
+                terminal = 0.5
+            else:
+                terminal = None
+            children.append(
+                self._newNode(node, col, PRIOR_WEIGHTS[col] / total, terminal)
+            )
+        self.children[node] = children
+
+    def _select(self, node):
+        visits, value, prior = self.visits, self.value, self.prior
+        c = self.exploration
+        best = None
+        bestScore = -math.inf
+        if self.policy == "uct":
+            logN = math.log(visits[node] or 1)
+            for child in self.children[node]:
+                n = visits[child]
+                if n == 0:
+                    return child
+                score = value[child] / n + c * math.sqrt(logN / n)
+                if score > bestScore:
+                    best, bestScore = child, score
+        else:
+            sqrtN = math.sqrt(visits[node])
+            for child in self.children[node]:
+                n = visits[child]
+                q = value[child] / n if n else 0.5
+                score = q + c * prior[child] * sqrtN / (1 + n)
+                if score > bestScore:
+                    best, bestScore = child, score
+        return best
+
+    def _playout(self, current, mask, moves):
+        # Random game from the position; the result for the player who moved
+        # into it. Only ints change hands, nothing is allocated per move.
+        randrange = self.rng.randrange
+        mover = 0
+        while moves < SIZE:
+            col = randrange(COLS)
+            while mask & TOP_BITS[col]:
+                col = randrange(COLS)
+            bit = (mask + BOTTOM_BITS[col]) & COLUMN_MASKS[col]
+            if hasFour(current | bit):
+                return 0.0 if mover == 0 else 1.0
+            current, mask = current ^ mask, mask | bit
+            moves += 1
+            mover ^= 1
+        return 0.5
+
+    def _find(self, node, current, mask, target, depth):
+        # Descendant of node at the given depth holding the target position
+        if (current, mask) == target:
+            return node
+        if depth == 0 or self.children[node] is None:
+            return None
+        for child in self.children[node]:
+            col = self.move[child]
+            bit = (mask + BOTTOM_BITS[col]) & COLUMN_MASKS[col]
+            found = self._find(child, current ^ mask, mask | bit, target, depth - 1)
+            if found is not None:
+                return found
+        return None
+
+    def _reroot(self, node):
+        # Copy the subtree under node into a fresh pool, node becoming 0
+        move, children, visits, value, prior, terminal = (
+            self.move,
+            self.children,
+            self.visits,
+            self.value,
+            self.prior,
+            self.terminal,
+        )
+        self.parent, self.move, self.children = [], [], []
+        self.visits, self.value, self.prior, self.terminal = [], [], [], []
+        queue = [(node, None)]
+        for oldNode, newParent in queue:
+            new = self._newNode(
+                newParent, move[oldNode], prior[oldNode], terminal[oldNode]
+            )
+            self.visits[new] = visits[oldNode]
+            self.value[new] = value[oldNode]
+            if newParent is not None:
+                self.children[newParent].append(new)
+            if children[oldNode] is not None:
+                self.children[new] = []
+                queue.extend((child, new) for child in children[oldNode])
+        self.root = 0
+
+    def _setRoot(self, current, mask):
+        position = (current, mask)
+        if self.rootPosition is not None:
+            rootCurrent, rootMask = self.rootPosition
+            depth = mask.bit_count() - rootMask.bit_count()
+            found = None
+            if 0 <= depth <= 2 and rootMask & mask == rootMask:
+                found = self._find(self.root, rootCurrent, rootMask, position, depth)
+            if found is not None:
+                self._reroot(found)
+                self.reusedVisits = self.visits[0]
+                self.rootPosition = position
+                return
+        self.reset()
+        self.root = self._newNode(None, None, 1.0, None)
+        self.rootPosition = position
+
+    def _descend(self, current, mask, moves):
+        # Path from the root to the leaf to play out, and the leaf position
+        children, terminal, move = self.children, self.terminal, self.move
+        node, c, m, n = self.root, current, mask, moves
+        path = [node]
+        # Selection
+        while children[node] is not None and terminal[node] is None:
+            node = self._select(node)
+            bit = (m + BOTTOM_BITS[move[node]]) & COLUMN_MASKS[move[node]]
+            c, m, n = c ^ m, m | bit, n + 1
+            path.append(node)
+        # Expansion, unless the pool is full
+        if (
+            terminal[node] is None
+            and (self.visits[node] or node == self.root)
+            and len(self.visits) + COLS <= self.capacity
+        ):
+            self._expand(node, c, m, n)
+            node = self._select(node)
+            bit = (m + BOTTOM_BITS[move[node]]) & COLUMN_MASKS[move[node]]
+            c, m, n = c ^ m, m | bit, n + 1
+            path.append(node)
+        return path, c, m, n
+
+    def _backup(self, path, result, counted=False, games=1):
+        # Result (summed over games) is for the player who moved into the
+        # leaf; the point of view flips at every ply. counted: the visits were
+        # already added on the way down.
+        visits, value = self.visits, self.value
+        for node in reversed(path):
+            if not counted:
+                visits[node] += games
+            value[node] += result
+            result = games - result
+
+    def _batch(self, current, mask, moves, count):
+        # Collect `count` leaves and play them all out in one call to the
+        # NumPy kernel. Each visit is counted on the way down (virtual loss),
+        # so later descents in the batch spread over other moves.
+        games = self.leafPlayouts
+        pending = []
+        for _ in range(count):
+            path, c, m, n = self._descend(current, mask, moves)
+            for node in path:
+                self.visits[node] += games
+            leaf = path[-1]
+            if self.terminal[leaf] is not None:
+                self._backup(path, self.terminal[leaf] * games, True, games)
+            else:
+                pending.append((path, c, m, n))
+        if pending:
+            # Player 1 always starts, so the stone count tells who is to move
+            toMove = [1 if n % 2 == 0 else 2 for _, _, _, n in pending]
+            bits1 = [c if n % 2 == 0 else c ^ m for _, c, m, n in pending]
+            bits2 = [c ^ m if n % 2 == 0 else c for _, c, m, n in pending]
+            winners = randomPlayouts(
+                np.repeat(bitsToGrids(bits1, bits2), games, axis=0),
+                np.repeat(toMove, games),
+                self.npRng,
+            ).reshape(len(pending), games)
+            toMove = np.array(toMove)[:, np.newaxis]
+            # Wins of the player who moved into each leaf, draws count half
+            results = (winners == 3 - toMove).sum(axis=1) + 0.5 * (winners == 0).sum(
+                axis=1
+            )
+            for (path, _, _, _), result in zip(pending, results.tolist()):
+                self._backup(path, result, True, games)
+        self.playouts += count * games
+
+    def search(self, board, timeBudgetMs=None, playouts=None, cancelEvent=None):
+        # (win rate, (row, col)) of the most visited move for the player to
+        # move on the board (player 1 always starts). Runs for timeBudgetMs,
+        # or for a number of playouts; one second if neither is given. Setting
+        # cancelEvent stops the search early.
+        if timeBudgetMs is None and playouts is None:
+            timeBudgetMs = 1000
+        bits, mask = boardBits(board)
+        moves = mask.bit_count()
+        current = bits[1 if moves % 2 == 0 else 2]
+        self.resetSearchStats()
+        self._setRoot(current, mask)
+
+        start = time.perf_counter()
+        deadline = None if timeBudgetMs is None else start + timeBudgetMs / 1000
+        while True:
+            if playouts is not None and self.playouts >= playouts:
+                break
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+            if cancelEvent is not None and cancelEvent.is_set():
+                break
+            if self.rollouts == "numpy":
+                count = self.batchSize
+                if playouts is not None:
+                    remaining = playouts - self.playouts
+                    count = min(count, -(-remaining // self.leafPlayouts))
+                self._batch(current, mask, moves, count)
+                continue
+            path, c, m, n = self._descend(current, mask, moves)
+            leaf = path[-1]
+            if self.terminal[leaf] is not None:
+                result = self.terminal[leaf]
+            else:
+                result = self._playout(c, m, n)
+            self._backup(path, result)
+            self.playouts += 1
+        self.elapsed = time.perf_counter() - start
+
+        root, children = self.root, self.children
+        if children[root] is None:
+            return 0.5, None
+        best = max(children[root], key=lambda child: self.visits[child])
+        col = self.move[best]
+        row = ROWS - 1 - (mask & COLUMN_MASKS[col]).bit_count()
+        winRate = self.value[best] / self.visits[best] if self.visits[best] else 0.5
+        return winRate, (row, col)
@@ -0,0 +1,105 @@
+import argparse
+import struct
+import time
+
+import numpy as np
+
+import evaluation
+from bitboard import COLS, boardKey
+from connect import Play
+
+# File layout: header, then records sorted by key so lookups can bisect
+HEADER = struct.Struct("<4sII")
+MAGIC = b"C4BK"
+VERSION = 1
+RECORD_DTYPE = np.dtype([("key", "<u8"), ("move", "u1"), ("score", "<f4")])
+
+
+class OpeningBook:
+    # Best moves for the first plies, memory-mapped from a file written by
+    # generateBook. A position and its mirror image share one record.
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            magic, version, count = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} opening book")
+        self.path = path
+        if count:
+            self.records = np.memmap(
+                path, dtype=RECORD_DTYPE, mode="r", offset=HEADER.size, shape=(count,)
+            )
+        else:
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+        self.keys = self.records["key"]
+
+    def __len__(self):
+        return len(self.records)
+
+    def lookup(self, board):
+        # (column, score) for the board, or None if the position is not booked
+        key, mirrored = boardKey(board)
+        index = int(np.searchsorted(self.keys, key))
+        if index == len(self.keys) or int(self.keys[index]) != key:
+            return None
+        record = self.records[index]
+        col = int(record["move"])
+        if mirrored:
+            col = COLS - 1 - col
+        return col, float(record["score"])
+
+
+def writeBook(path, entries):
+    # entries: {canonical key: (column, score)}
+    records = np.zeros(len(entries), dtype=RECORD_DTYPE)
+    for i, key in enumerate(sorted(entries)):
+        col, score = entries[key]
+        records[i] = (key, col, score)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(records)))
+        f.write(records.tobytes())
+
+
+def generateBook(path, plies, depth, heuristic_function, piece=2):
+    # Search every position up to `plies` moves in where `piece` is to move
+    # (player 1 always starts) and write the results to `path`
+    play = Play(backend="bitboard")
+    board = play.board
+    entries = {}
+    seen = set()
+
+    def visit(ply, to_move):
+        key, mirrored = boardKey(board)
+        if key in seen or board.isTerminal():
+            return
+        seen.add(key)
+        if to_move == piece:
+            score, move = play.minimaxAlphaBetaPruning(
+                board, depth, float("-inf"), float("inf"), True, heuristic_function
+            )
+            col = move[1]
+            # Store the move for the canonical orientation
+            entries[key] = (COLS - 1 - col if mirrored else col, score)
+        if ply < plies:
+            for col in board.getPossibleMoves():
+                board.play(col, to_move)
+                visit(ply + 1, 3 - to_move)
+                board.undo()
+
+    visit(0, 1)
+    writeBook(path, entries)
+    return len(entries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the opening book")
+    parser.add_argument("--plies", type=int, default=3)
+    parser.add_argument("--depth", type=int, default=8)
+    parser.add_argument("--out", default="opening_book.bin")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = generateBook(args.out, args.plies, args.depth, evaluation.FusedEvaluator())
+    print(
+        f"Wrote {count} positions to {args.out} "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
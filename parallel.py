@@ -0,0 +1,262 @@
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from connect import CENTER_ORDER, Play, SearchTimeout
+from searchstats import SearchStats
+from sharedtt import SharedTranspositionTable
+
+# How often a search waiting on its workers checks its cancelEvent, in seconds
+CANCEL_POLL_INTERVAL = 0.01
+
+# Per-process state set up once by _initWorker
+_play = None
+_sharedAlpha = None
+
+
+class _SharedFlag:
+    # threading.Event look-alike over a multiprocessing.Value, so a worker's
+    # Play sees the parent cancel a search through its usual cancelEvent check
+    def __init__(self, value):
+        self.value = value
+
+    def is_set(self):
+        return bool(self.value.value)
+
+
+def _initWorker(
+    sharedAlpha, cancelled, backend, ttSizeMb, ttReplacement, moveOrdering, tableName
+):
+    global _play, _sharedAlpha
+    _play = Play(
+        backend=backend,
+        ttSizeMb=0 if tableName else ttSizeMb,
+        ttReplacement=ttReplacement,
+        moveOrdering=moveOrdering,
+    )
+    if tableName:
+        _play.transpositionTable = SharedTranspositionTable(
+            replacement=ttReplacement, name=tableName
+        )
+    _play.cancelEvent = _SharedFlag(cancelled)
+    _sharedAlpha = sharedAlpha
+
+
+def _ping(_):
+    return os.getpid()
+
+
+def _searchRootMove(grid, col, depth, alpha, heuristic_function, deadline, share):
+    # Value of one root move for the maximizing player (2), searched with the
+    # window (alpha, inf). Returns (row, value, alpha used, SearchStats, pid,
+    # table stats), or None if the deadline passed or the search was
+    # cancelled. perf_counter is a system-wide clock, so the parent's
+    # deadline is valid here.
+    board = _play.board
+    board.set_board(grid)
+    if share:
+        alpha = max(alpha, _sharedAlpha.value)
+    _play.resetSearchStats()
+    _play.deadline = deadline
+    row = board.play(col, 2)
+    try:
+        value, _ = _play.minimaxAlphaBetaPruning(
+            board, depth - 1, alpha, float("inf"), False, heuristic_function, ply=1
+        )
+    except SearchTimeout:
+        return None
+    finally:
+        _play.deadline = None
+    if share and value > alpha:
+        with _sharedAlpha.get_lock():
+            if value > _sharedAlpha.value:
+                _sharedAlpha.value = value
+    table = _play.transpositionTable
+    return row, value, alpha, _play.stats, os.getpid(), table and table.stats()
+
+
+class ParallelSearch:
+    # Root-split alpha-beta over a pool of persistent worker processes. The
+    # first root move is searched alone (young brothers wait), the rest in
+    # parallel; each one starts from the best root value found so far, which
+    # workers share through a multiprocessing.Value. Only one search may run
+    # at a time. With sharedTable the workers use one transposition table in
+    # shared memory instead of a private one each. A cancelEvent given to a
+    # search stops the workers through the shared cancelled flag.
+    def __init__(
+        self,
+        workers=None,
+        backend="bitboard",
+        ttSizeMb=16,
+        ttReplacement="depth",
+        moveOrdering=True,
+        sharedTable=True,
+    ):
+        self.workers = workers or os.cpu_count()
+        self.sharedAlpha = multiprocessing.Value("d", -math.inf)
+        self.cancelled = multiprocessing.Value("b", 0)
+        self.table = (
+            SharedTranspositionTable(ttSizeMb, ttReplacement)
+            if sharedTable and ttSizeMb
+            else None
+        )
+        # Latest table stats reported by each worker process
+        self.workerStats = {}
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_initWorker,
+            initargs=(
+                self.sharedAlpha,
+                self.cancelled,
+                backend,
+                ttSizeMb,
+                ttReplacement,
+                moveOrdering,
+                self.table and self.table.name,
+            ),
+        )
+        # Start every worker now instead of on the first move
+        list(self.executor.map(_ping, range(self.workers)))
+        self.resetSearchStats()
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+        if self.table is not None:
+            self.table.close()
+
+    def resetSearchStats(self):
+        self.stats = SearchStats()
+        self.researches = 0
+
+    @property
+    def nodes(self):
+        return self.stats.nodes
+
+    def searchStats(self):
+        return dict(
+            self.stats.asDict(), workers=self.workers, researches=self.researches
+        )
+
+    def tableStats(self):
+        # {worker pid: transposition table stats}
+        return dict(self.workerStats)
+
+    def iterativeDeepening(
+        self, board, timeBudgetMs, heuristic_function, maxDepth=None, cancelEvent=None
+    ):
+        # Same contract as Play.iterativeDeepening; the stats add up the
+        # searches of every worker
+        if maxDepth is None:
+            maxDepth = board.rows * board.cols - board.moveCount
+        start = time.perf_counter()
+        self.resetSearchStats()
+        stats = self.stats
+        result = (heuristic_function(board, 2), None)
+        deadline = None
+        for depth in range(1, maxDepth + 1):
+            nodes = stats.nodes
+            try:
+                eval, move = self.search(
+                    board,
+                    depth,
+                    heuristic_function,
+                    firstMove=result[1][1] if result[1] else None,
+                    deadline=deadline,
+                    cancelEvent=cancelEvent,
+                )
+            except SearchTimeout:
+                stats.interrupted = True
+                break
+            result = (eval, move)
+            stats.depth = depth
+            stats.iterationNodes.append(stats.nodes - nodes)
+            if move is None:
+                break
+            deadline = start + timeBudgetMs / 1000
+        stats.elapsed = time.perf_counter() - start
+        return result[0], result[1], stats
+
+    def search(
+        self,
+        board,
+        depth,
+        heuristic_function,
+        firstMove=None,
+        deadline=None,
+        cancelEvent=None,
+    ):
+        # (eval, (row, col)) for player 2 to move. The move is the one a
+        # serial search with the same root order picks: the first move with
+        # the best value. Raises SearchTimeout if the deadline passes or
+        # cancelEvent is set first.
+        moves = [col for col in CENTER_ORDER if col in board.getPossibleMoves()]
+        if depth == 0 or board.isTerminal() or not moves:
+            return heuristic_function(board, 2), None
+        if firstMove in moves:
+            moves.remove(firstMove)
+            moves.insert(0, firstMove)
+        grid = board.board.copy()
+
+        def submit(col, alpha, share=True):
+            return self.executor.submit(
+                _searchRootMove,
+                grid,
+                col,
+                depth,
+                alpha,
+                heuristic_function,
+                deadline,
+                share,
+            )
+
+        def collect(futures):
+            if cancelEvent is not None:
+                pending = futures
+                while pending:
+                    if cancelEvent.is_set():
+                        # Stop the running workers and wait for them, so the
+                        # next search does not queue behind them
+                        self.cancelled.value = 1
+                        for future in futures:
+                            future.cancel()
+                        wait(futures)
+                        raise SearchTimeout()
+                    _, pending = wait(pending, timeout=CANCEL_POLL_INTERVAL)
+            results = [future.result() for future in futures]
+            if None in results:
+                for future in futures:
+                    future.cancel()
+                raise SearchTimeout()
+            for result in results:
+                self.stats.merge(result[3])
+                self.workerStats[result[4]] = result[5]
+            return results
+
+        self.sharedAlpha.value = -math.inf
+        self.cancelled.value = 0
+        results = collect([submit(moves[0], -math.inf)])
+        results += collect([submit(col, results[0][1]) for col in moves[1:]])
+
+        # Values above the alpha they were searched with are exact; the
+        # others are only upper bounds
+        exact = [i == 0 or result[1] > result[2] for i, result in enumerate(results)]
+        best = max(result[1] for result, isExact in zip(results, exact) if isExact)
+        chosen = next(
+            i for i, result in enumerate(results) if exact[i] and result[1] == best
+        )
+        # An earlier move that failed low against alpha == best may also be
+        # worth exactly best; the serial search would have kept that one
+        ties = [i for i in range(chosen) if not exact[i] and results[i][2] >= best]
+        if ties:
+            self.researches += len(ties)
+            below = math.nextafter(best, -math.inf)
+            for i, result in zip(
+                ties, collect([submit(moves[i], below, False) for i in ties])
+            ):
+                if result[1] > below:
+                    chosen = i
+                    break
+        row = results[chosen][0]
+        return best, (row, moves[chosen])
@@ -0,0 +1,73 @@
+import numpy as np
+
+from bitboard import CELL_WEIGHTS, COLS, ROWS
+
+# Boards are padded by three empty cells on every side, so looking up to three
+# cells away from the last move never leaves the array
+PAD = 3
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+def bitsToGrids(bits1, bits2):
+    # (n, ROWS, COLS) grids from arrays of player 1 / player 2 bitboards
+    bits1 = np.asarray(bits1, dtype=np.int64)[:, np.newaxis]
+    bits2 = np.asarray(bits2, dtype=np.int64)[:, np.newaxis]
+    grids = ((bits1 & CELL_WEIGHTS) != 0).astype(np.int8)
+    grids += 2 * ((bits2 & CELL_WEIGHTS) != 0).astype(np.int8)
+    return grids.reshape(-1, ROWS, COLS)
+
+
+def randomPlayouts(boards, toMove, rng=None):
+    # Finish every game in the (n, ROWS, COLS) batch with uniformly random
+    # legal moves, all games advancing together. toMove is the piece to move
+    # in each game (a scalar or an (n,) array). Returns the winner of each
+    # game: 1, 2, or 0 for a draw.
+    rng = rng or np.random.default_rng()
+    boards = np.asarray(boards)
+    n = len(boards)
+    grids = np.zeros((n, ROWS + 2 * PAD, COLS + 2 * PAD), dtype=np.int8)
+    grids[:, PAD:-PAD, PAD:-PAD] = boards
+    heights = np.count_nonzero(boards, axis=1)
+    player = np.broadcast_to(np.asarray(toMove, dtype=np.int8), (n,)).copy()
+    winners = np.zeros(n, dtype=np.int8)
+    active = np.arange(n)
+
+    while len(active):
+        legal = heights[active] < ROWS
+        # Full boards are draws
+        open_ = legal.any(axis=1)
+        active = active[open_]
+        legal = legal[open_]
+        if not len(active):
+            break
+        # Random legal column per game: the largest random key among legal ones
+        cols = (rng.random(legal.shape) * legal).argmax(axis=1)
+        rows = ROWS - 1 - heights[active, cols]
+        pieces = player[active]
+        heights[active, cols] += 1
+        r = rows + PAD
+        c = cols + PAD
+        grids[active, r, c] = pieces
+
+        # Win detection on the last move only
+        won = np.zeros(len(active), dtype=bool)
+        for dr, dc in DIRECTIONS:
+            count = np.ones(len(active), dtype=np.int8)
+            for sign in (1, -1):
+                alive = np.ones(len(active), dtype=bool)
+                for step in (1, 2, 3):
+                    alive &= (
+                        grids[active, r + sign * dr * step, c + sign * dc * step]
+                        == pieces
+                    )
+                    count += alive
+            won |= count >= 4
+        winners[active[won]] = pieces[won]
+        active = active[~won]
+        player[active] = 3 - player[active]
+    return winners
+
+
+def outcomes(winners, piece):
+    # Win, draw and loss vectors for piece
+    return winners == piece, winners == 0, winners == 3 - piece
@@ -0,0 +1,53 @@
+import struct
+
+# How the server tells a room about a move:
+#   "full"   update_board with the whole board, as before
+#   "delta"  a move event with just the move and its sequence number
+#   "binary" a move_frame event holding the same fields packed by FRAME
+PROTOCOLS = ("full", "delta", "binary")
+
+# seq, column, row, piece, ply, flags; 9 bytes, little endian
+FRAME = struct.Struct("<I5B")
+GAME_OVER = 1
+
+
+def moveUpdate(seq, column, row, piece, ply, gameOver):
+    # Every board change gets the next sequence number of its room, so a
+    # client that sees a gap asks for a snapshot instead of guessing
+    return {
+        "seq": seq,
+        "column": column,
+        "row": row,
+        "piece": piece,
+        "ply": ply,
+        "game_over": gameOver,
+    }
+
+
+def encodeFrame(update):
+    return FRAME.pack(
+        update["seq"],
+        update["column"],
+        update["row"],
+        update["piece"],
+        update["ply"],
+        GAME_OVER if update["game_over"] else 0,
+    )
+
+
+def decodeFrame(frame):
+    seq, column, row, piece, ply, flags = FRAME.unpack(frame)
+    return moveUpdate(seq, column, row, piece, ply, bool(flags & GAME_OVER))
+
+
+def nextSeq(last, seq):
+    # What a client that has applied update `last` does with update `seq`, as
+    # applyMove in App.vue: "stale" drops it, "apply" applies it, and "gap"
+    # (an update was missed) asks for a snapshot instead
+    if seq <= last:
+        return "stale"
+    return "apply" if seq == last + 1 else "gap"
+
+
+def snapshot(board, seq, room):
+    return {"board": board.get_board(), "seq": seq, "room": room}
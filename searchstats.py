@@ -0,0 +1,83 @@
+# The search times one node in SAMPLE_INTERVAL (the nodes where it checks its
+# deadline anyway) and scales the sampled times up to the whole search
+SAMPLE_INTERVAL = 64
+SAMPLE_MASK = SAMPLE_INTERVAL - 1
+
+
+class SearchStats:
+    # Filled in by Play while it searches and returned with the move. The
+    # counters are exact; the split of time between the heuristic, move
+    # generation and terminal checks is estimated from the sampled nodes.
+    def __init__(self, maxPly=42):
+        self.nodes = 0
+        # Positions scored by the heuristic
+        self.leaves = 0
+        self.cutoffs = [0] * (maxPly + 1)
+        self.firstMoveCutoffs = 0
+        self.maxPly = 0
+        # Deepest completed iteration, and the nodes of every iteration
+        self.depth = 0
+        self.iterationNodes = []
+        self.ttProbes = 0
+        self.ttHits = 0
+        self.ttCutoffs = 0
+        self.samples = 0
+        self.heuristicTime = 0.0
+        self.moveGenerationTime = 0.0
+        self.terminalTime = 0.0
+        self.elapsed = 0.0
+        # The last iteration was cut short by the deadline or a cancel
+        self.interrupted = False
+
+    def merge(self, other):
+        # Add the counters of a search of part of the tree, e.g. one root move
+        # searched by a worker process
+        self.nodes += other.nodes
+        self.leaves += other.leaves
+        self.cutoffs = [a + b for a, b in zip(self.cutoffs, other.cutoffs)]
+        self.firstMoveCutoffs += other.firstMoveCutoffs
+        self.maxPly = max(self.maxPly, other.maxPly)
+        self.ttProbes += other.ttProbes
+        self.ttHits += other.ttHits
+        self.ttCutoffs += other.ttCutoffs
+        self.samples += other.samples
+        self.heuristicTime += other.heuristicTime
+        self.moveGenerationTime += other.moveGenerationTime
+        self.terminalTime += other.terminalTime
+
+    def branchingFactor(self):
+        # Effective branching factor: the b with b ** depth equal to the nodes
+        # of the deepest completed iteration
+        if not self.depth or not self.iterationNodes:
+            return 0.0
+        return self.iterationNodes[-1] ** (1 / self.depth)
+
+    def asDict(self):
+        scale = self.nodes / self.samples if self.samples else 0.0
+        cutoffs = sum(self.cutoffs)
+        return {
+            "depth": self.depth,
+            "max_ply": self.maxPly,
+            "nodes": self.nodes,
+            "leaves": self.leaves,
+            "iteration_nodes": self.iterationNodes,
+            "ebf": self.branchingFactor(),
+            "cutoffs": cutoffs,
+            "cutoffs_per_ply": self.cutoffs[: self.maxPly + 1],
+            "first_move_cutoffs": self.firstMoveCutoffs,
+            # Share of cutoffs produced by the first move tried; close to 1
+            # means the ordering is near perfect
+            "first_move_cutoff_rate": (
+                self.firstMoveCutoffs / cutoffs if cutoffs else 0.0
+            ),
+            "tt_probes": self.ttProbes,
+            "tt_hits": self.ttHits,
+            "tt_cutoffs": self.ttCutoffs,
+            "tt_hit_rate": self.ttHits / self.ttProbes if self.ttProbes else 0.0,
+            "elapsed": self.elapsed,
+            "nodes_per_second": self.nodes / self.elapsed if self.elapsed else 0.0,
+            "heuristic_time": self.heuristicTime * scale,
+            "move_generation_time": self.moveGenerationTime * scale,
+            "terminal_check_time": self.terminalTime * scale,
+            "interrupted": self.interrupted,
+        }
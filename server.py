@@ -1,172 +1,604 @@
-from flask import Flask, jsonify
+import atexit
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from flask import Flask, jsonify, request
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
-from connect import ConnectFourBoard, Play
+from flask_socketio import SocketIO, emit, join_room, leave_room
+import evaluation
+import incremental
+from connect import BOARD_BACKENDS
+from openingbook import OpeningBook
+from parallel import ParallelSearch
+from protocol import PROTOCOLS, encodeFrame, moveUpdate, snapshot
+from sessions import Session, SessionLimitReached, SessionRegistry
+from solvedcache import SolvedCache
+from solver import Position, Solver, SolverBudgetExceeded
+from transposition import TranspositionTable
+
+# "numpy" or "bitboard"; both expose the same board API to the search
+BOARD_BACKEND = "bitboard"
+# Transposition table budget and replacement policy ("depth" or "always"),
+# one table shared by every game
+TT_SIZE_MB = 64
+TT_REPLACEMENT = "depth"
+# Per-move thinking time; clients may ask for a different budget within limits
+AI_TIME_BUDGET_MS = 1000
+MIN_TIME_BUDGET_MS = 50
+MAX_TIME_BUDGET_MS = 10000
+# Written by `python openingbook.py`; the server runs without it if missing
+OPENING_BOOK_PATH = "opening_book.bin"
+# Positions with at least this many pieces are solved exactly when the solver
+# finishes within its node budget and within SOLVER_TIME_SHARE of the move's
+# time budget, and the results are kept on disk. The time the solver takes
+# comes out of the search's budget.
+SOLVED_CACHE_PATH = "solved_positions.sqlite3"
+SOLVED_CACHE_MIN_PIECES = 20
+SOLVED_CACHE_MAX_ENTRIES = 200000
+SOLVER_NODE_BUDGET = 100000
+SOLVER_TIME_SHARE = 0.25
+# Worker processes for the AI's search; 0 searches in the server process
+SEARCH_WORKERS = 0
+# "minimax" or "mcts"; the opening book and the solver are used by both
+AI_ENGINE = "minimax"
+MCTS_POLICY = "uct"
+# "python" plays each MCTS leaf out alone; "numpy" batches them, and plays
+# every leaf MCTS_LEAF_PLAYOUTS times
+MCTS_ROLLOUTS = "numpy"
+MCTS_LEAF_PLAYOUTS = 4
+# Tree size limit per game, which bounds the memory of a session using MCTS
+# (about 200 bytes a node). MCTS_TOTAL_NODES bounds the trees of all sessions
+# together: with MAX_SESSIONS sessions each gets an equal share at most.
+MCTS_SESSION_NODES = 100000
+MCTS_TOTAL_NODES = 5000000
+# Trees of sessions idle for this long are freed; a later search starts anew
+MCTS_IDLE_RELEASE_S = 120
+# Every game lives in a room; sessions idle for longer than the timeout are
+# dropped, and no more than MAX_SESSIONS are kept
+SESSION_IDLE_TIMEOUT_S = 900
+SESSION_SWEEP_INTERVAL_S = 60
+MAX_SESSIONS = 1000
+# AI turns run on a thread pool so handlers return at once; at most
+# AI_QUEUE_LIMIT turns may be running or waiting
+AI_WORKERS = 4
+AI_QUEUE_LIMIT = 64
+# AI-vs-AI matches run in the background, at most MAX_AI_VS_AI_MATCHES at a
+# time, waiting AI_VS_AI_PACE_MS between moves unless the client asks for
+# another pace
+MAX_AI_VS_AI_MATCHES = 32
+AI_VS_AI_PACE_MS = 500
+MAX_AI_VS_AI_PACE_MS = 5000
+# How moves reach a room: "full" boards, "delta" move events or "binary"
+# move frames (see protocol.py). Resets and snapshots always carry the board.
+UPDATE_PROTOCOL = "delta"
+assert UPDATE_PROTOCOL in PROTOCOLS
+# Statistics of every AI search (see searchstats.py) are logged as one JSON
+# line per move, and with ATTACH_SEARCH_STATS also sent to the room with the
+# move ("search" field, or a search_stats event next to binary frames)
+LOG_SEARCH_STATS = True
+ATTACH_SEARCH_STATS = False
 
 app = Flask(__name__)
 CORS(app)
 socketio = SocketIO(app, cors_allowed_origins="*")
 
-board = ConnectFourBoard()
-play = Play(mode="human_vs_computer")
+# heuristicEval4 as a single-pass evaluator; tune it with weights=,
+# earlyWeights= and lateWeights= here
+ai_heuristic = evaluation.FusedEvaluator()
+opening_book = (
+    OpeningBook(OPENING_BOOK_PATH) if os.path.exists(OPENING_BOOK_PATH) else None
+)
+solver = Solver(nodeBudget=SOLVER_NODE_BUDGET)
+solved_cache = SolvedCache(
+    SOLVED_CACHE_PATH,
+    minPieces=SOLVED_CACHE_MIN_PIECES,
+    maxEntries=SOLVED_CACHE_MAX_ENTRIES,
+)
+print(f"Loaded {solved_cache.warm()} solved positions")
+atexit.register(solved_cache.close)
+transposition_table = TranspositionTable(TT_SIZE_MB, TT_REPLACEMENT)
+ai_pool = ThreadPoolExecutor(max_workers=AI_WORKERS, thread_name_prefix="ai")
+ai_slots = threading.BoundedSemaphore(AI_QUEUE_LIMIT)
+atexit.register(ai_pool.shutdown, wait=False, cancel_futures=True)
+match_slots = threading.BoundedSemaphore(MAX_AI_VS_AI_MATCHES)
+# Heuristics an AI-vs-AI match may pit against each other, by name
+HEURISTICS = {
+    "heuristicEval1": incremental.heuristicEval1,
+    "heuristicEval2": evaluation.heuristicEval2,
+    "heuristicEval3": incremental.heuristicEval3,
+    "heuristicEval4": evaluation.heuristicEval4,
+    "fused": ai_heuristic,
+}
+# The solver and the parallel search serve one search at a time; a room
+# that finds the solver busy plays from the cache or searches instead
+solver_lock = threading.Lock()
+cache_lock = threading.Lock()
+parallel_lock = threading.Lock()
+parallel_search = (
+    ParallelSearch(
+        workers=SEARCH_WORKERS,
+        backend=BOARD_BACKEND,
+        ttSizeMb=TT_SIZE_MB,
+        ttReplacement=TT_REPLACEMENT,
+    )
+    if SEARCH_WORKERS
+    else None
+)
+
+
+def new_session(room):
+    return Session(
+        room,
+        BOARD_BACKEND,
+        transposition_table,
+        {
+            "policy": MCTS_POLICY,
+            "rollouts": MCTS_ROLLOUTS,
+            "leafPlayouts": MCTS_LEAF_PLAYOUTS,
+            "capacity": min(MCTS_SESSION_NODES, MCTS_TOTAL_NODES // MAX_SESSIONS),
+        },
+    )
+
+
+sessions = SessionRegistry(
+    new_session, idleTimeout=SESSION_IDLE_TIMEOUT_S, maxSessions=MAX_SESSIONS
+)
+
+
+def sweep_sessions():
+    while True:
+        socketio.sleep(SESSION_SWEEP_INTERVAL_S)
+        for room in sessions.evictIdle():
+            print(f"Evicted idle session {room}")
+        released = sessions.releaseIdleTrees(MCTS_IDLE_RELEASE_S)
+        if released:
+            print(f"Freed the MCTS trees of {len(released)} idle sessions")
+
+
+def current_session():
+    session, created = sessions.session(request.sid)
+    session.touch()
+    if created:
+        # The room's game was lost: have its clients start over from the new
+        # board instead of dropping every update as out of date
+        with session.lock:
+            update = snapshot(session.board, session.seq, session.room)
+        emit("snapshot", update, to=session.room)
+    return session
 
 
 @socketio.on("connect")
 def handle_connect():
-    print("Client connected")
-    emit("initial_board", {"board": board.get_board()})
+    # Clients pick a game with ?room=...; without one they get a game of
+    # their own
+    room = request.args.get("room") or f"game-{request.sid}"
+    try:
+        session = sessions.join(request.sid, room)
+    except SessionLimitReached:
+        print("Rejected client: too many sessions")
+        return False
+    join_room(room)
+    print(f"Client connected to room {room}")
+    with session.lock:
+        emit("initial_board", snapshot(session.board, session.seq, room))
+
+
+@socketio.on("join_game")
+def handle_join_game(data=None):
+    room = data.get("room") if isinstance(data, dict) else None
+    if not isinstance(room, str) or not room:
+        emit("error", {"message": "join_game needs a room"})
+        return
+    old_room = sessions.roomOf(request.sid)
+    try:
+        session = sessions.join(request.sid, room)
+    except SessionLimitReached:
+        emit("error", {"message": "Too many games in progress"})
+        return
+    if old_room is not None and old_room != room:
+        leave_room(old_room)
+    join_room(room)
+    print(f"Client moved to room {room}")
+    with session.lock:
+        emit("initial_board", snapshot(session.board, session.seq, room))
+
+
+@socketio.on("request_snapshot")
+def handle_request_snapshot():
+    # Clients that missed a move (a gap in seq) resynchronize from here
+    session = current_session()
+    with session.lock:
+        emit("snapshot", snapshot(session.board, session.seq, session.room))
 
 
 @socketio.on("disconnect")
 def handle_disconnect():
-    print("Client disconnected")
+    room = sessions.leave(request.sid)
+    print(f"Client disconnected from room {room}")
+    session = sessions.get(room)
+    if session is not None and not session.members:
+        # Nobody is left to see the answer
+        session.cancelSearch()
 
 
 @socketio.on("reset_board")
 def handle_reset_board():
     print("Received reset_board event from client")
-    global board
+    session = current_session()
 
-    board.resetBoard()
+    session.reset()
 
-    updated_board = board.get_board()
+    with session.lock:
+        update = snapshot(session.board, session.seq, session.room)
 
-    emit("update_board", {"board": updated_board, "player": "pla"}, broadcast=True)
+    emit("update_board", dict(update, player="pla"), to=session.room)
+    emit("ai_status", {"status": "idle"}, to=session.room)
 
 
-def play_ai_turn():
-    global board
-
-    _, move = play.minimaxAlphaBetaPruning(
-        board,
-        depth=5,
-        alpha=float("-inf"),
-        beta=float("inf"),
-        maximizingPlayer=True,
-        heuristic_function=ConnectFourBoard.heuristicEval4,
+def record_move(session, column, piece):
+    # Play a move on the session's board, with session.lock held, and return
+    # what the room is told about it
+    board = session.board
+    row = board.play(column, piece)
+    session.seq += 1
+    update = moveUpdate(
+        session.seq, column, row, piece, board.moveCount, board.isTerminal()
     )
+    if UPDATE_PROTOCOL == "full":
+        update["board"] = board.get_board()
+    return update
+
+
+def broadcast_move(room, update, turn=None, search=None):
+    attach = ATTACH_SEARCH_STATS and search is not None
+    if UPDATE_PROTOCOL == "binary":
+        socketio.emit("move_frame", encodeFrame(update), to=room)
+        if attach:
+            socketio.emit("search_stats", dict(search, seq=update["seq"]), to=room)
+        return
+    if attach:
+        update = dict(update, search=search)
+    if UPDATE_PROTOCOL == "delta":
+        socketio.emit("move", update, to=room)
+    else:
+        update = dict(update, turn=turn) if turn is not None else update
+        socketio.emit("update_board", update, to=room)
+
+
+def log_search(room, column, search):
+    if LOG_SEARCH_STATS:
+        print(
+            json.dumps({"event": "ai_move", "room": room, "column": column, **search})
+        )
 
-    board.makeMove(move[0], move[1], play.player2_piece)
-
-    print(f"AI made a move in column {move[1]}")
-    print(board.get_board())
-
-    game_over = board.gameOver()
 
-    emit(
-        "update_board",
-        {"board": board.get_board(), "game_over": game_over, "turn": "Computer"},
-        broadcast=True,
+def time_budget(data):
+    budget = (data or {}).get("time_budget_ms", AI_TIME_BUDGET_MS)
+    try:
+        budget = int(budget)
+    except (TypeError, ValueError, OverflowError):
+        # Not a number (or an infinite one): use the default
+        budget = AI_TIME_BUDGET_MS
+    return min(max(budget, MIN_TIME_BUDGET_MS), MAX_TIME_BUDGET_MS)
+
+
+def solved_move(board, time_budget_ms):
+    # (column, score) from the cache, or from the solver if it proves the
+    # position within its budgets; None for early or too hard positions, or
+    # when another room is using the solver
+    if board.moveCount < SOLVED_CACHE_MIN_PIECES:
+        return None
+    with cache_lock:
+        cached = solved_cache.lookup(board)
+    if cached is not None:
+        return cached
+    if not solver_lock.acquire(blocking=False):
+        return None
+    try:
+        solver.deadline = time.perf_counter() + time_budget_ms / 1000
+        column, score = solver.bestMove(Position.fromBoard(board))
+    except SolverBudgetExceeded:
+        print(f"Solver gave up after {solver.nodes} nodes")
+        return None
+    finally:
+        solver.deadline = None
+        solver_lock.release()
+    print("Solver:", solver.stats())
+    with cache_lock:
+        solved_cache.store(board, column, score)
+    return column, score
+
+
+def choose_ai_move(session, board, cancel_event, time_budget_ms):
+    # (column, search stats) for the computer on board, a private copy of the
+    # session's board; the column is None if the search was cancelled before
+    # finishing depth 1
+    play = session.play
+    start = time.perf_counter()
+
+    book_move = opening_book.lookup(board) if opening_book else None
+    solved = (
+        None if book_move else solved_move(board, time_budget_ms * SOLVER_TIME_SHARE)
+    )
+    if book_move is not None and book_move[0] in board.getPossibleMoves():
+        print(f"AI made a book move in column {book_move[0]}")
+        return book_move[0], {"source": "book"}
+    if solved is not None:
+        column, score = solved
+        print(f"AI made a solved move in column {column} (score {score})")
+        return column, {"source": "solver", "score": score}
+    # Whatever the solver spent is taken off the search
+    time_budget_ms = max(
+        time_budget_ms - (time.perf_counter() - start) * 1000, MIN_TIME_BUDGET_MS
     )
+    if AI_ENGINE == "mcts":
+        win_rate, move = session.mcts.search(
+            board, time_budget_ms, cancelEvent=cancel_event
+        )
+        search = dict(session.mcts.searchStats(), source="mcts", win_rate=win_rate)
+        if move is None or cancel_event.is_set():
+            return None, search
+        print(f"AI made a move in column {move[1]} (win rate {win_rate:.2f})")
+        return move[1], search
+    if parallel_search is not None:
+        with parallel_lock:
+            _, move, stats = parallel_search.iterativeDeepening(
+                board,
+                time_budget_ms,
+                heuristic_function=ai_heuristic,
+                cancelEvent=cancel_event,
+            )
+            search = parallel_search.searchStats()
+            print("Transposition table per worker:", parallel_search.tableStats())
+    else:
+        play.cancelEvent = cancel_event
+        try:
+            _, move, stats = play.iterativeDeepening(
+                board, time_budget_ms, heuristic_function=ai_heuristic
+            )
+        finally:
+            play.cancelEvent = None
+        search = stats.asDict()
+        print("Transposition table:", play.transpositionTable.stats())
+    search["source"] = "minimax"
+    if move is None or cancel_event.is_set():
+        return None, search
+    print(f"AI made a move in column {move[1]} (depth {stats.depth})")
+    return move[1], search
+
+
+def play_ai_turn(session, generation, cancel_event, time_budget_ms):
+    # Runs on the AI pool. The move is dropped if the game was reset or
+    # abandoned in the meantime (the session's generation moved on).
+    try:
+        with session.lock:
+            board = BOARD_BACKENDS[BOARD_BACKEND]()
+            board.set_board(session.board.board)
+        with session.searchLock:
+            if session.generation != generation:
+                return
+            column, search = choose_ai_move(
+                session, board, cancel_event, time_budget_ms
+            )
+        log_search(session.room, column, search)
+        with session.lock:
+            if session.generation != generation or column is None:
+                print(f"[{session.room}] Dropped a superseded AI move")
+                return
+            update = record_move(session, column, session.play.player2_piece)
+            session.thinking = False
+        print(f"[{session.room}]", update)
+
+        broadcast_move(session.room, update, turn="Computer", search=search)
+        socketio.emit("ai_status", {"status": "idle"}, to=session.room)
+    except Exception:
+        traceback.print_exc()
+        session.thinking = False
+        socketio.emit("ai_status", {"status": "error"}, to=session.room)
+    finally:
+        ai_slots.release()
+
+
+def illegal_move(board, column, piece):
+    # Why a move sent by a client cannot be played, or None if it can
+    if board.isTerminal():
+        return "The game is over"
+    if piece not in (1, 2):
+        return f"Invalid piece {piece!r}"
+    if type(column) is not int or column not in board.getPossibleMoves():
+        return f"Column {column!r} is not a legal move"
+    return None
 
 
 @socketio.on("take_turn")
-def handle_take_turn(data):
+def handle_take_turn(data=None):
     print("Received take_turn event from client")
-    column = data["column"]
-    piece = data["piece"]
+    # A missing or malformed payload is an illegal move like any other
+    data = data if isinstance(data, dict) else {}
+    column = data.get("column")
+    piece = data.get("piece")
 
     print(f"Player made a move in column {column}")
 
-    global board
-
-    board.makeMove(
-        max([r for r in range(board.rows) if board.board[r][column] == 0]),
-        column,
-        piece,
-    )
-
-    print(board.get_board())
-
-    # Check for a winner after human move
-    game_over = board.gameOver()
-
-    # Broadcast the updated board state to all connected clients
-    emit(
-        "update_board",
-        {
-            "board": board.get_board(),
-            "game_over": game_over,
-        },
-        broadcast=True,
-    )
-
-    # If the game is not over, play AI turn
-    if not game_over:
-        print("AI is taking its turn")
-        play_ai_turn()
-
-
-def play_ai_vs_ai():
-    global board
-
-    while not board.gameOver():
-        # Player 1 (AI) makes a move
-        _, move = play.minimaxAlphaBetaPruning(
-            board,
-            depth=5,
-            alpha=float("-inf"),
-            beta=float("inf"),
-            maximizingPlayer=True,
-            heuristic_function=ConnectFourBoard.heuristicEval1,
-        )
-
-        board.makeMove(move[0], move[1], play.player1_piece)
-
-        print(f"AI 1 made a move in column {move[1]}")
-        print(board.get_board())
-
-        game_over = board.gameOver()
-
-        emit(
-            "update_board",
-            {
-                "board": board.get_board(),
-                "game_over": game_over,
-                "turn": play.player1_piece,
-            },
-            broadcast=True,
-        )
-
-        # If the game is over, break the loop
-        if game_over:
-            break
-
-        # Player 2 (AI) makes a move
-        _, move = play.minimaxAlphaBetaPruning(
-            board,
-            depth=5,
-            alpha=float("-inf"),
-            beta=float("inf"),
-            maximizingPlayer=True,
-            heuristic_function=ConnectFourBoard.heuristicEval3,
+    session = current_session()
+    board = session.board
+
+    with session.lock:
+        if session.match:
+            emit("match_status", {"status": "busy"})
+            return
+        if session.thinking:
+            emit("ai_status", {"status": "thinking"})
+            return
+        error = illegal_move(board, column, piece)
+        if error is not None:
+            emit("error", {"message": error})
+            return
+        # Claim a place in the AI queue before accepting the move
+        if not ai_slots.acquire(blocking=False):
+            emit("ai_status", {"status": "busy"})
+            return
+        try:
+            update = record_move(session, column, piece)
+        except Exception:
+            ai_slots.release()
+            raise
+        # Check for a winner after human move
+        game_over = update["game_over"]
+        if not game_over:
+            session.thinking = True
+            generation = session.generation
+            cancel_event = session.cancelEvent
+
+    # Until the turn is handed to the pool, the slot and the thinking flag
+    # are ours to give back
+    try:
+        print(f"[{session.room}]", update)
+
+        # Send the move to everyone in the game
+        broadcast_move(session.room, update)
+
+        # If the game is not over, the AI answers from the pool
+        if not game_over:
+            print("AI is taking its turn")
+            emit("ai_status", {"status": "thinking"}, to=session.room)
+            ai_pool.submit(
+                play_ai_turn, session, generation, cancel_event, time_budget(data)
+            )
+            return
+    except Exception:
+        if not game_over:
+            with session.lock:
+                if session.generation == generation:
+                    session.thinking = False
+        ai_slots.release()
+        raise
+    ai_slots.release()
+
+
+def play_ai_vs_ai(
+    session, generation, cancel_event, heuristics, time_budget_ms, pace_ms
+):
+    # Runs as a background task, one per room. Each move is streamed to the
+    # room as soon as it is made; a reset or stop_ai_vs_ai moves the
+    # session's generation on and ends the match after the current search.
+    play = session.play
+    outcome = "stopped"
+    try:
+        socketio.emit(
+            "match_status",
+            {"status": "started", "player1": heuristics[1], "player2": heuristics[2]},
+            to=session.room,
         )
+        while True:
+            with session.lock:
+                if session.generation != generation:
+                    break
+                grid = session.board.board.copy()
+            # Player 1 always starts, so the piece count tells whose move it is.
+            # Play searches for player 2, so player 1 searches the board with
+            # the colors swapped (as tournament.swapColors does).
+            piece = 1 if np.count_nonzero(grid) % 2 == 0 else 2
+            board = BOARD_BACKENDS[BOARD_BACKEND]()
+            board.set_board(grid if piece == 2 else np.where(grid == 0, 0, 3 - grid))
+            if board.isTerminal():
+                outcome = "finished"
+                break
+            with session.searchLock:
+                play.cancelEvent = cancel_event
+                try:
+                    _, move, stats = play.iterativeDeepening(
+                        board,
+                        time_budget_ms,
+                        heuristic_function=HEURISTICS[heuristics[piece]],
+                    )
+                finally:
+                    play.cancelEvent = None
+            with session.lock:
+                if session.generation != generation or move is None:
+                    break
+                update = record_move(session, move[1], piece)
+
+            print(f"AI {piece} made a move in column {move[1]}")
+            print(f"[{session.room}]", update)
+            search = dict(stats.asDict(), source="minimax", heuristic=heuristics[piece])
+            log_search(session.room, move[1], search)
+
+            broadcast_move(session.room, update, turn=piece, search=search)
+            if update["game_over"]:
+                outcome = "finished"
+                break
+            # Pace the match for the viewers; stopping it cuts the wait short
+            if cancel_event.wait(pace_ms / 1000):
+                break
+    except Exception:
+        traceback.print_exc()
+        outcome = "error"
+    finally:
+        session.match = False
+        match_slots.release()
+        socketio.emit("match_status", {"status": outcome}, to=session.room)
+
+
+def match_pace(data):
+    pace = (data or {}).get("pace_ms", AI_VS_AI_PACE_MS)
+    try:
+        pace = int(pace)
+    except (TypeError, ValueError, OverflowError):
+        pace = AI_VS_AI_PACE_MS
+    return min(max(pace, 0), MAX_AI_VS_AI_PACE_MS)
 
-        board.makeMove(move[0], move[1], play.player2_piece)
-
-        print(f"AI 2 made a move in column {move[1]}")
-        print(board.get_board())
-
-        # Check for a winner after AI 2 move
-        game_over = board.gameOver()
 
-        # Broadcast the updated board state to all connected clients
+@socketio.on("ai_vs_ai")
+def handle_ai_vs_ai(data=None):
+    print("Received ai_vs_ai event from client")
+    data = data or {}
+    heuristics = {
+        1: data.get("player1", "heuristicEval1"),
+        2: data.get("player2", "heuristicEval3"),
+    }
+    unknown = [name for name in heuristics.values() if name not in HEURISTICS]
+    if unknown:
         emit(
-            "update_board",
-            {
-                "board": board.get_board(),
-                "game_over": game_over,
-                "turn": play.player2_piece,
-            },
-            broadcast=True,
+            "match_status",
+            {"status": "error", "message": f"Unknown heuristic {unknown[0]}"},
         )
+        return
+
+    session = current_session()
+    with session.lock:
+        if session.thinking or session.match:
+            emit("match_status", {"status": "busy"})
+            return
+        if not match_slots.acquire(blocking=False):
+            emit("match_status", {"status": "busy"})
+            return
+        session.match = True
+        generation = session.generation
+        cancel_event = session.cancelEvent
+
+    socketio.start_background_task(
+        play_ai_vs_ai,
+        session,
+        generation,
+        cancel_event,
+        heuristics,
+        time_budget(data),
+        match_pace(data),
+    )
 
 
-@socketio.on("ai_vs_ai")
-def handle_ai_vs_ai():
-    print("Received ai_vs_ai event from client")
-    play_ai_vs_ai()
+@socketio.on("stop_ai_vs_ai")
+def handle_stop_ai_vs_ai():
+    print("Received stop_ai_vs_ai event from client")
+    current_session().cancelSearch()
 
 
 if __name__ == "__main__":
+    socketio.start_background_task(sweep_sessions)
     socketio.run(app, debug=True)
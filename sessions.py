@@ -0,0 +1,189 @@
+import threading
+import time
+
+from connect import BOARD_BACKENDS, Play
+from mcts import MCTS
+
+
+class SessionLimitReached(Exception):
+    pass
+
+
+class Session:
+    # One game room. The transposition table is shared by all sessions, so a
+    # session only holds its board and the small move ordering tables of its
+    # Play, plus an MCTS tree once that engine is used.
+    def __init__(self, room, backend, transpositionTable, mctsOptions=None):
+        self.room = room
+        self.board = BOARD_BACKENDS[backend]()
+        self.play = Play(mode="human_vs_computer", backend=backend, ttSizeMb=0)
+        self.play.transpositionTable = transpositionTable
+        self.mctsOptions = mctsOptions or {}
+        self._mcts = None
+        self.members = set()
+        self.lastActive = time.monotonic()
+        # AI search state: a search started for an older generation is stale
+        # and its move is dropped. lock guards the board, searchLock lets only
+        # one search at a time use play and the MCTS tree.
+        self.generation = 0
+        # Sequence number of the last board change sent to the room
+        self.seq = 0
+        self.thinking = False
+        # An AI-vs-AI match is running in the background
+        self.match = False
+        self.cancelEvent = threading.Event()
+        self.lock = threading.Lock()
+        self.searchLock = threading.Lock()
+
+    @property
+    def mcts(self):
+        if self._mcts is None:
+            self._mcts = MCTS(**self.mctsOptions)
+        return self._mcts
+
+    def touch(self):
+        self.lastActive = time.monotonic()
+
+    def cancelSearch(self):
+        # Supersede the running search, if any
+        self.generation += 1
+        self.thinking = False
+        self.cancelEvent.set()
+        self.cancelEvent = threading.Event()
+
+    def reset(self):
+        self.cancelSearch()
+        with self.lock:
+            self.board.resetBoard()
+            self.seq += 1
+        # Wait for a cancelled search to let go of play and the tree
+        with self.searchLock:
+            self.play.newGame()
+            if self._mcts is not None:
+                self._mcts.reset()
+
+    def releaseTree(self):
+        # Free the MCTS tree unless a search is using it; True if freed
+        if self._mcts is None or not self.searchLock.acquire(blocking=False):
+            return False
+        self._mcts = None
+        self.searchLock.release()
+        return True
+
+
+class SessionRegistry:
+    # Sessions by room, and the room of every connected socket. Only sessions
+    # nobody is connected to are evicted; should a socket's session be gone
+    # anyway, it gets a fresh one in the same room on its next event.
+    def __init__(self, factory, idleTimeout=900, maxSessions=1000):
+        self.factory = factory
+        self.idleTimeout = idleTimeout
+        self.maxSessions = maxSessions
+        self.sessions = {}
+        self.rooms = {}
+        self.evictions = 0
+        # New sessions number their board changes on from the highest seq of
+        # any evicted one, so seq never goes back within a room
+        self.seqFloor = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def join(self, sid, room):
+        with self.lock:
+            if self.rooms.get(sid) not in (None, room):
+                self._leave(sid)
+            session = self._session(room)
+            session.members.add(sid)
+            self.rooms[sid] = room
+            return session
+
+    def leave(self, sid):
+        # Room the socket was in, or None; the session stays until it idles out
+        with self.lock:
+            return self._leave(sid)
+
+    def session(self, sid):
+        # (session of the socket's room, whether it was created anew); a new
+        # session means the room's game was lost and its clients must resync
+        with self.lock:
+            room = self.rooms.get(sid)
+            if room is None:
+                return None, False
+            created = room not in self.sessions
+            session = self._session(room)
+            session.members.add(sid)
+            return session, created
+
+    def roomOf(self, sid):
+        return self.rooms.get(sid)
+
+    def get(self, room):
+        return self.sessions.get(room)
+
+    def evictIdle(self, now=None):
+        # Drop sessions nobody is connected to that have had no activity for
+        # idleTimeout seconds
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            idle = [
+                room
+                for room, session in self.sessions.items()
+                if not session.members and now - session.lastActive > self.idleTimeout
+            ]
+            for room in idle:
+                self._evict(self.sessions[room])
+            self.evictions += len(idle)
+            return idle
+
+    def releaseIdleTrees(self, idleTime, now=None):
+        # Free the MCTS trees of sessions without activity for idleTime
+        # seconds; the sessions themselves stay until they idle out
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            idle = [
+                session
+                for session in self.sessions.values()
+                if now - session.lastActive > idleTime
+            ]
+        return [session.room for session in idle if session.releaseTree()]
+
+    def stats(self):
+        return {
+            "sessions": len(self.sessions),
+            "sockets": len(self.rooms),
+            "evictions": self.evictions,
+        }
+
+    def _leave(self, sid):
+        room = self.rooms.pop(sid, None)
+        session = self.sessions.get(room)
+        if session is not None:
+            session.members.discard(sid)
+        return room
+
+    def _session(self, room):
+        session = self.sessions.get(room)
+        if session is None:
+            if len(self.sessions) >= self.maxSessions:
+                self._evictOldest()
+            session = self.factory(room)
+            session.seq = self.seqFloor
+            self.sessions[room] = session
+        session.touch()
+        return session
+
+    def _evictOldest(self):
+        # Make room by dropping the least recently active session nobody is in
+        empty = [session for session in self.sessions.values() if not session.members]
+        if not empty:
+            raise SessionLimitReached(f"{self.maxSessions} sessions in use")
+        oldest = min(empty, key=lambda session: session.lastActive)
+        self._evict(oldest)
+        self.evictions += 1
+
+    def _evict(self, session):
+        del self.sessions[session.room]
+        session.cancelSearch()
+        self.seqFloor = max(self.seqFloor, session.seq)
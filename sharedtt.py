@@ -0,0 +1,121 @@
+import struct
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Each entry is three 64-bit words: check, data, score. The data word packs
+# depth (8 bits), flag (2), move row (3) and column (3, 7 = no move) and a used
+# bit; the score is a float64. check = key ^ data ^ score bits, so an entry
+# torn by two processes writing at once fails the check and reads as a miss
+# instead of returning a mix of both (no locks needed).
+WORDS = 3
+ENTRY_BYTES = WORDS * 8
+NO_MOVE = 7
+USED = 1 << 16
+_WORD = struct.Struct("Q")
+_DOUBLE = struct.Struct("d")
+
+
+class SharedTranspositionTable:
+    # Same interface as TranspositionTable, but the slots live in a
+    # multiprocessing.shared_memory block that every process attaches to by
+    # name; only the creating process unlinks it. Counters are per process,
+    # so stats() describes one worker.
+    def __init__(self, sizeMb=16, replacement="depth", name=None):
+        if replacement not in ("depth", "always"):
+            raise ValueError("replacement must be 'depth' or 'always'")
+        self.replacement = replacement
+        self.owner = name is None
+        if self.owner:
+            slots = max(1, int(sizeMb * 2**20) // ENTRY_BYTES)
+            size = 1 << (slots.bit_length() - 1)
+            self.memory = shared_memory.SharedMemory(
+                create=True, size=size * ENTRY_BYTES
+            )
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            # The block may be rounded up to whole pages
+            size = 1 << ((self.memory.size // ENTRY_BYTES).bit_length() - 1)
+        self.name = self.memory.name
+        self.size = size
+        self.mask = size - 1
+        self.words = self.memory.buf.cast("Q")
+        self.resetStats()
+
+    def close(self):
+        self.words.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+    def resetStats(self):
+        self.probes = 0
+        self.hits = 0
+        self.collisions = 0
+        self.stores = 0
+        self.overwrites = 0
+        self.rejected = 0
+
+    def clear(self):
+        words = np.frombuffer(self.memory.buf, dtype=np.uint64)
+        words[:] = 0
+        del words
+        self.resetStats()
+
+    def _read(self, index):
+        # (key, data, score) of an entry, or None; each word is read once so
+        # the key check covers exactly the values returned
+        base = index * WORDS
+        check = self.words[base]
+        data = self.words[base + 1]
+        bits = self.words[base + 2]
+        if not data & USED:
+            return None
+        return check ^ data ^ bits, data, _DOUBLE.unpack(_WORD.pack(bits))[0]
+
+    def probe(self, key):
+        # Returns (key, depth, flag, value, move) or None
+        self.probes += 1
+        entry = self._read(key & self.mask)
+        if entry is None:
+            return None
+        if entry[0] != key:
+            # A different position, or a torn write
+            self.collisions += 1
+            return None
+        self.hits += 1
+        _, data, value = entry
+        row = (data >> 10) & 7
+        col = (data >> 13) & 7
+        move = None if col == NO_MOVE else (row, col)
+        return key, data & 0xFF, (data >> 8) & 3, value, move
+
+    def store(self, key, depth, flag, value, move):
+        index = key & self.mask
+        old = self._read(index)
+        if old is not None and old[0] != key:
+            if self.replacement == "depth" and old[1] & 0xFF > depth:
+                self.rejected += 1
+                return
+            self.overwrites += 1
+        row, col = move if move is not None else (0, NO_MOVE)
+        data = USED | min(depth, 0xFF) | flag << 8 | row << 10 | col << 13
+        bits = _WORD.unpack(_DOUBLE.pack(value))[0]
+        base = index * WORDS
+        self.words[base + 2] = bits
+        self.words[base + 1] = data
+        self.words[base] = key ^ data ^ bits
+        self.stores += 1
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "replacement": self.replacement,
+            "probes": self.probes,
+            "hits": self.hits,
+            "collisions": self.collisions,
+            "stores": self.stores,
+            "overwrites": self.overwrites,
+            "rejected": self.rejected,
+            "hit_rate": self.hits / self.probes if self.probes else 0.0,
+        }
@@ -0,0 +1,166 @@
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from bitboard import COLS, boardKey
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (
+    key INTEGER PRIMARY KEY,
+    move INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS positions_used ON positions (used);
+"""
+
+
+class SolvedCache:
+    # Exact scores and best moves of solved positions, kept in SQLite across
+    # restarts. Lookups only touch the in-memory copy filled by warm(); new
+    # results are written by a background thread in batches. Keys are
+    # canonical, so a position and its mirror image share one entry, and
+    # scores are from the point of view of the player to move.
+    def __init__(
+        self, path, minPieces=20, maxEntries=200000, batchSize=256, flushInterval=1.0
+    ):
+        self.path = path
+        self.minPieces = minPieces
+        self.maxEntries = maxEntries
+        self.batchSize = batchSize
+        self.flushInterval = flushInterval
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.pending = queue.Queue()
+        with sqlite3.connect(path) as connection:
+            connection.executescript(SCHEMA)
+        self.writer = threading.Thread(target=self._writeLoop, daemon=True)
+        self.writer.start()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def warm(self):
+        # Load the most recently used entries that fit in the cap
+        connection = sqlite3.connect(self.path)
+        try:
+            rows = connection.execute(
+                "SELECT key, move, score FROM positions ORDER BY used DESC LIMIT ?",
+                (self.maxEntries,),
+            ).fetchall()
+        finally:
+            connection.close()
+        self.entries.clear()
+        for key, move, score in reversed(rows):
+            self.entries[key] = (move, score)
+        return len(rows)
+
+    def lookup(self, board):
+        # (column, score) for the board, or None if it was never solved
+        if board.moveCount < self.minPieces:
+            return None
+        key, mirrored = boardKey(board)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        self.pending.put((key, None, None, time.time()))
+        move, score = entry
+        return (COLS - 1 - move if mirrored else move), score
+
+    def store(self, board, col, score):
+        if board.moveCount < self.minPieces:
+            return
+        key, mirrored = boardKey(board)
+        move = COLS - 1 - col if mirrored else col
+        self.entries[key] = (move, score)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxEntries:
+            self.entries.popitem(last=False)
+        self.pending.put((key, move, score, time.time()))
+
+    def flush(self):
+        # Block until every queued write has reached the database
+        self.pending.join()
+
+    def close(self):
+        self.flush()
+        self.pending.put(None)
+        self.writer.join()
+
+    def _writeLoop(self):
+        connection = sqlite3.connect(self.path)
+        try:
+            while True:
+                batch = [self.pending.get()]
+                if batch[0] is None:
+                    self.pending.task_done()
+                    return
+                # Gather what else arrives shortly after, up to one batch
+                deadline = time.monotonic() + self.flushInterval
+                while len(batch) < self.batchSize:
+                    try:
+                        item = self.pending.get(
+                            timeout=max(0.0, deadline - time.monotonic())
+                        )
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        # Put the stop marker back for the outer loop
+                        self.pending.task_done()
+                        self.pending.put(None)
+                        break
+                    batch.append(item)
+                try:
+                    self._write(connection, batch)
+                finally:
+                    for _ in batch:
+                        self.pending.task_done()
+        finally:
+            connection.close()
+
+    def _write(self, connection, batch):
+        stores = [
+            (key, move, score, used)
+            for key, move, score, used in batch
+            if move is not None
+        ]
+        touches = [(used, key) for key, move, _, used in batch if move is None]
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO positions (key, move, score, used) "
+                "VALUES (?, ?, ?, ?)",
+                stores,
+            )
+            connection.executemany(
+                "UPDATE positions SET used = ? WHERE key = ?", touches
+            )
+            (count,) = connection.execute("SELECT COUNT(*) FROM positions").fetchone()
+            if count > self.maxEntries:
+                # Evict the least recently used rows
+                connection.execute(
+                    "DELETE FROM positions WHERE key IN "
+                    "(SELECT key FROM positions ORDER BY used LIMIT ?)",
+                    (count - self.maxEntries,),
+                )
+                self.evictions += count - self.maxEntries
+        self.writes += len(stores)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "pending": self.pending.qsize(),
+        }
@@ -0,0 +1,279 @@
+import argparse
+import time
+
+from bitboard import (
+    BOARD_MASK,
+    BOTTOM_BITS,
+    BOTTOM_MASK,
+    COLS,
+    COLUMN_MASKS,
+    ROWS,
+    TOP_BITS,
+    boardBits,
+    hasFour,
+)
+from threats import popcount, winningCells
+
+# Scores follow the usual convention: positive if the player to move wins,
+# larger the sooner. Winning with your last stone counts 1, a draw is 0.
+SIZE = ROWS * COLS
+MIN_SCORE = -(SIZE // 2) + 3
+MAX_SCORE = (SIZE + 1) // 2 - 3
+ORDER = [3, 2, 4, 1, 5, 0, 6]
+
+
+class SolverBudgetExceeded(Exception):
+    pass
+
+
+class Position:
+    # Compact board for the solver: the stones of the player to move plus the
+    # mask of all stones, in the bitboard.py layout
+    def __init__(self, current=0, mask=0, moves=0):
+        self.current = current
+        self.mask = mask
+        self.moves = moves
+
+    @classmethod
+    def fromMoves(cls, sequence):
+        # Column digits starting at 1, as in the standard test sets ("4453")
+        position = cls()
+        for char in sequence:
+            col = int(char) - 1
+            if not 0 <= col < COLS or not position.canPlay(col):
+                raise ValueError(f"invalid move sequence {sequence!r}")
+            if position.isWinningMove(col):
+                raise ValueError(f"{sequence!r} contains a finished game")
+            position.playCol(col)
+        return position
+
+    @classmethod
+    def fromBoard(cls, board):
+        # Player 1 always starts, so the stone count says whose turn it is
+        bits, mask = boardBits(board)
+        moves = popcount(mask)
+        return cls(bits[1 if moves % 2 == 0 else 2], mask, moves)
+
+    def copy(self):
+        return Position(self.current, self.mask, self.moves)
+
+    def canPlay(self, col):
+        return not self.mask & TOP_BITS[col]
+
+    def playCol(self, col):
+        self.current ^= self.mask
+        self.mask |= self.mask + BOTTOM_BITS[col]
+        self.moves += 1
+
+    def isWinningMove(self, col):
+        move = (self.mask + BOTTOM_BITS[col]) & COLUMN_MASKS[col]
+        return hasFour(self.current | move)
+
+    def canWinNext(self):
+        possible = (self.mask + BOTTOM_MASK) & BOARD_MASK
+        return bool(winningCells(self.current) & possible & ~self.mask)
+
+    def key(self):
+        return self.current + self.mask
+
+
+class Solver:
+    def __init__(self, ttSize=1048573, nodeBudget=None):
+        # Prime slot count; entries hold an upper bound for the position
+        self.ttSize = ttSize
+        self.nodeBudget = nodeBudget
+        # perf_counter() time after which a search gives up, like nodeBudget
+        self.deadline = None
+        self.reset()
+        self.nodes = 0
+        self.elapsed = 0.0
+
+    def reset(self):
+        self.keys = [0] * self.ttSize
+        self.values = [0] * self.ttSize
+
+    def negamax(self, current, mask, moves, alpha, beta):
+        # Assumes the player to move cannot win immediately
+        self.nodes += 1
+        if self.nodeBudget is not None and self.nodes > self.nodeBudget:
+            raise SolverBudgetExceeded(self.nodes)
+        if (
+            self.deadline is not None
+            and not self.nodes & 1023
+            and time.perf_counter() > self.deadline
+        ):
+            raise SolverBudgetExceeded(self.nodes)
+
+        empty = BOARD_MASK & ~mask
+        possible = (mask + BOTTOM_MASK) & BOARD_MASK
+        opponentWins = winningCells(current ^ mask) & empty
+        forced = possible & opponentWins
+        if forced:
+            if forced & (forced - 1):
+                # Two immediate threats cannot both be blocked
+                return -((SIZE - moves) // 2)
+            possible = forced
+        # Never play directly below an opponent's winning cell
+        nonLosing = possible & ~(opponentWins >> 1)
+        if not nonLosing:
+            return -((SIZE - moves) // 2)
+        if moves >= SIZE - 2:
+            return 0
+
+        low = -((SIZE - 2 - moves) // 2)
+        if alpha < low:
+            alpha = low
+            if alpha >= beta:
+                return alpha
+        high = (SIZE - 1 - moves) // 2
+        key = current + mask
+        index = key % self.ttSize
+        if self.keys[index] == key:
+            high = self.values[index] + MIN_SCORE - 1
+        if beta > high:
+            beta = high
+            if alpha >= beta:
+                return beta
+
+        # Moves that create the most new threats first, center first on ties
+        candidates = []
+        for rank, col in enumerate(ORDER):
+            move = nonLosing & COLUMN_MASKS[col]
+            if move:
+                own = current | move
+                score = popcount(winningCells(own) & empty & ~move)
+                candidates.append((-score, rank, move))
+        candidates.sort()
+
+        child = current ^ mask
+        for _, _, move in candidates:
+            score = -self.negamax(child, mask | move, moves + 1, -beta, -alpha)
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+
+        self.keys[index] = key
+        self.values[index] = alpha - MIN_SCORE + 1
+        return alpha
+
+    def solve(self, position, weak=False):
+        # Exact score of the position, or only its sign with weak=True.
+        # Raises SolverBudgetExceeded once nodeBudget nodes are searched or
+        # the deadline has passed.
+        self.nodes = 0
+        start = time.perf_counter()
+        try:
+            return self._solve(position, weak)
+        finally:
+            self.elapsed = time.perf_counter() - start
+
+    def _solve(self, position, weak):
+        if position.canWinNext():
+            return 1 if weak else (SIZE + 1 - position.moves) // 2
+        low = -((SIZE - position.moves) // 2)
+        high = (SIZE + 1 - position.moves) // 2
+        if weak:
+            low, high = -1, 1
+        # Null-window probes narrow [low, high] until it closes
+        while low < high:
+            probe = low + (high - low) // 2
+            if probe <= 0 and -(-low // 2) < probe:
+                probe = -(-low // 2)
+            elif probe >= 0 and high // 2 > probe:
+                probe = high // 2
+            result = self.negamax(
+                position.current, position.mask, position.moves, probe, probe + 1
+            )
+            if result <= probe:
+                high = result
+            else:
+                low = result
+        if weak:
+            return (low > 0) - (low < 0)
+        return low
+
+    def analyze(self, position, weak=False):
+        # Score of every column for the player to move, None where full.
+        # The node budget covers all columns together.
+        scores = [None] * COLS
+        self.nodes = 0
+        start = time.perf_counter()
+        try:
+            for col in range(COLS):
+                if not position.canPlay(col):
+                    continue
+                if position.isWinningMove(col):
+                    scores[col] = 1 if weak else (SIZE + 1 - position.moves) // 2
+                    continue
+                child = position.copy()
+                child.playCol(col)
+                scores[col] = -self._solve(child, weak)
+        finally:
+            self.elapsed = time.perf_counter() - start
+        return scores
+
+    def bestMove(self, position, weak=False):
+        # (column, score), center first among equal scores
+        scores = self.analyze(position, weak)
+        col = max(
+            (col for col in ORDER if scores[col] is not None), key=lambda c: scores[c]
+        )
+        return col, scores[col]
+
+    def stats(self):
+        return {
+            "nodes": self.nodes,
+            "elapsed": self.elapsed,
+            "nodes_per_second": self.nodes / self.elapsed if self.elapsed else 0.0,
+        }
+
+
+def benchmark(path, weak=False, nodeBudget=None):
+    # Test sets hold one "moves score" line per position, e.g. the
+    # Test_L{1,2,3}_R{1,2,3} files, where L3 positions are close to the end
+    # of the game and L1 positions close to the start
+    solver = Solver(nodeBudget=nodeBudget)
+    count = correct = nodes = 0
+    elapsed = 0.0
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            sequence, expected = line.split()
+            expected = int(expected)
+            if weak:
+                expected = (expected > 0) - (expected < 0)
+            solver.reset()
+            try:
+                score = solver.solve(Position.fromMoves(sequence), weak)
+            except SolverBudgetExceeded:
+                score = None
+            count += 1
+            correct += score == expected
+            nodes += solver.nodes
+            elapsed += solver.elapsed
+    return {
+        "positions": count,
+        "correct": correct,
+        "mean_time": elapsed / count if count else 0.0,
+        "mean_nodes": nodes / count if count else 0.0,
+        "nodes_per_second": nodes / elapsed if elapsed else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the solver")
+    parser.add_argument("files", nargs="+", help="test sets of 'moves score' lines")
+    parser.add_argument("--weak", action="store_true", help="only solve win/draw/loss")
+    parser.add_argument("--node-budget", type=int, default=None)
+    args = parser.parse_args()
+
+    for path in args.files:
+        result = benchmark(path, args.weak, args.node_budget)
+        print(
+            f"{path}: {result['correct']}/{result['positions']} correct, "
+            f"mean {result['mean_time'] * 1000:.2f} ms, "
+            f"{result['mean_nodes']:.0f} nodes, "
+            f"{result['nodes_per_second'] / 1000:.1f} K nodes/s"
+        )
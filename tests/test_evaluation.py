@@ -0,0 +1,105 @@
+# The vectorized evaluators against the reference loops in connect.py, on
+# every position of random games
+import random
+
+import numpy as np
+import pytest
+
+import evaluation
+from connect import ConnectFourBoard
+
+HEURISTICS = ("heuristicEval1", "heuristicEval2", "heuristicEval3", "heuristicEval4")
+
+
+def randomMoves(count, seed=7):
+    # The columns of `count` random games played to the end, player 1 first
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        board = ConnectFourBoard()
+        piece = 1
+        moves = []
+        while not board.isTerminal():
+            col = rng.choice(board.getPossibleMoves())
+            board.play(col, piece)
+            moves.append(col)
+            piece = 3 - piece
+        games.append(moves)
+    return games
+
+
+def randomGames(count, seed=7):
+    # The positions of every game as a (positions, rows, cols) array
+    games = []
+    for moves in randomMoves(count, seed):
+        board = ConnectFourBoard()
+        positions = []
+        for ply, col in enumerate(moves):
+            board.play(col, 1 if ply % 2 == 0 else 2)
+            positions.append(board.board.copy())
+        games.append(np.array(positions))
+    return games
+
+
+GAMES = randomGames(40)
+
+
+def boards(positions):
+    board = ConnectFourBoard()
+    for grid in positions:
+        board.set_board(grid)
+        yield board
+
+
+@pytest.mark.parametrize("piece", (1, 2))
+@pytest.mark.parametrize("name", HEURISTICS)
+def test_vectorized_matches_reference(name, piece):
+    reference = getattr(ConnectFourBoard, name)
+    vectorized = getattr(evaluation, name)
+    for positions in GAMES:
+        for board in boards(positions):
+            assert vectorized(board, piece) == reference(
+                board, piece
+            ), board.get_board()
+
+
+@pytest.mark.parametrize("piece", (1, 2))
+@pytest.mark.parametrize("single", evaluation.BATCH_HEURISTICS)
+def test_batch_matches_single(single, piece):
+    batch = evaluation.BATCH_HEURISTICS[single]
+    for positions in GAMES:
+        expected = [single(board, piece) for board in boards(positions)]
+        assert list(batch(positions, piece)) == expected
+
+
+@pytest.mark.parametrize("piece", (1, 2))
+def test_fused_matches_reference(piece):
+    fused = evaluation.FusedEvaluator()
+    for positions in GAMES:
+        expected = []
+        for board in boards(positions):
+            expected.append(ConnectFourBoard.heuristicEval4(board, piece))
+            assert fused(board, piece) == expected[-1], board.get_board()
+        assert list(fused.batch(positions, piece)) == expected
+
+
+@pytest.mark.parametrize("piece", (1, 2))
+@pytest.mark.parametrize(
+    "evaluator, reference",
+    [
+        (evaluation.RunsEvaluator(), ConnectFourBoard.heuristicEval1),
+        (evaluation.EndsEvaluator(), ConnectFourBoard.heuristicEval2),
+        (evaluation.RunsEvaluator((300, 100, 10, 3)), None),
+        (evaluation.EndsEvaluator(10, 20), None),
+    ],
+    ids=lambda value: getattr(value, "key", None),
+)
+def test_parameterized_evaluators(evaluator, reference, piece):
+    # The defaults reproduce heuristicEval1/2; every setting batches the same
+    for positions in GAMES:
+        expected = []
+        for board in boards(positions):
+            expected.append(evaluator(board, piece))
+            if reference is not None:
+                assert expected[-1] == reference(board, piece), board.get_board()
+        assert list(evaluator.batch(positions, piece)) == expected
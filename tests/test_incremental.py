@@ -0,0 +1,69 @@
+# The running counts of incremental.py against the reference loops in
+# connect.py, kept up to date through play, undo, makeMove and set_board
+import pytest
+
+import incremental
+from connect import BOARD_BACKENDS, ConnectFourBoard
+from test_evaluation import GAMES, randomMoves
+
+MOVES = randomMoves(40)
+
+
+def assertMatches(board):
+    for piece in (1, 2):
+        assert incremental.heuristicEval1(
+            board, piece
+        ) == ConnectFourBoard.heuristicEval1(board, piece), board.get_board()
+        assert incremental.heuristicEval3(
+            board, piece
+        ) == ConnectFourBoard.heuristicEval3(board, piece), board.get_board()
+
+
+def observedBoard(backend):
+    # A board with the running counts attached before the first move
+    board = BOARD_BACKENDS[backend]()
+    incremental.windowCounts(board)
+    return board
+
+
+@pytest.mark.parametrize("backend", BOARD_BACKENDS)
+def test_play_and_undo(backend):
+    for moves in MOVES:
+        board = observedBoard(backend)
+        assertMatches(board)
+        for ply, col in enumerate(moves):
+            board.play(col, 1 if ply % 2 == 0 else 2)
+            assertMatches(board)
+        while board.moveHistory:
+            board.undo()
+            assertMatches(board)
+
+
+@pytest.mark.parametrize("backend", BOARD_BACKENDS)
+def test_make_move(backend):
+    for moves in MOVES:
+        board = observedBoard(backend)
+        cells = []
+        for ply, col in enumerate(moves):
+            row = board.rows - 1 - board.heights[col]
+            board.makeMove(row, col, 1 if ply % 2 == 0 else 2)
+            cells.append((row, col))
+            assertMatches(board)
+        # Overwriting a piece with the other color, then clearing the cells
+        row, col = cells[-1]
+        board.makeMove(row, col, 3 - board.board[row][col])
+        assertMatches(board)
+        for row, col in reversed(cells):
+            board.makeMove(row, col, 0)
+            assertMatches(board)
+
+
+@pytest.mark.parametrize("backend", BOARD_BACKENDS)
+def test_set_board(backend):
+    board = observedBoard(backend)
+    for positions in GAMES:
+        for grid in positions:
+            board.set_board(grid)
+            assertMatches(board)
+        board.resetBoard()
+        assertMatches(board)
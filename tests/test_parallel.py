@@ -0,0 +1,62 @@
+# The root-split search against the serial search at equal depth
+import random
+import threading
+
+import pytest
+
+import evaluation
+from connect import ConnectFourBitboard, Play
+from parallel import ParallelSearch
+
+
+@pytest.fixture(scope="module")
+def searcher():
+    searcher = ParallelSearch(workers=2, ttSizeMb=0)
+    yield searcher
+    searcher.close()
+
+
+def randomPositions(count, seed=7):
+    # Positions of random games a few moves in, none of them over
+    rng = random.Random(seed)
+    for _ in range(count):
+        board = ConnectFourBitboard()
+        piece = 1
+        for ply in range(rng.randrange(1, 20)):
+            board.play(rng.choice(board.getPossibleMoves()), piece)
+            piece = 3 - piece
+            if board.isTerminal():
+                board.undo()
+                break
+        yield board
+
+
+@pytest.mark.parametrize("depth", (1, 2, 3, 4))
+def test_matches_serial_search(searcher, depth):
+    for board in randomPositions(20):
+        serial = Play(backend="bitboard", ttSizeMb=0)
+        expected = serial.minimaxAlphaBetaPruning(
+            board,
+            depth,
+            float("-inf"),
+            float("inf"),
+            True,
+            evaluation.heuristicEval1,
+        )
+        assert searcher.search(board, depth, evaluation.heuristicEval1) == expected
+
+
+def test_cancelled_search_has_no_move(searcher):
+    cancelEvent = threading.Event()
+    cancelEvent.set()
+    board = next(randomPositions(1))
+    _, move, stats = searcher.iterativeDeepening(
+        board, 10000, evaluation.heuristicEval1, cancelEvent=cancelEvent
+    )
+    assert move is None
+    assert stats.interrupted
+    # The next search is not held up by the cancelled one
+    _, move, _ = searcher.iterativeDeepening(
+        board, 100, evaluation.heuristicEval1, maxDepth=2
+    )
+    assert move is not None
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from connect import ConnectFourBitboard
+from protocol import FRAME, decodeFrame, encodeFrame, moveUpdate, nextSeq, snapshot
+
+
+def gameUpdates():
+    # The update of every move of a short game that ends in a win
+    board = ConnectFourBitboard()
+    updates = []
+    for seq, col in enumerate([3, 4, 3, 4, 3, 4, 3], start=1):
+        piece = 1 if seq % 2 else 2
+        row = board.play(col, piece)
+        updates.append(
+            moveUpdate(seq, col, row, piece, board.moveCount, board.isTerminal())
+        )
+    return updates
+
+
+def test_delta_round_trip():
+    for update in gameUpdates():
+        assert json.loads(json.dumps(update)) == update
+    assert gameUpdates()[-1]["game_over"]
+
+
+def test_binary_round_trip():
+    for update in gameUpdates():
+        frame = encodeFrame(update)
+        assert len(frame) == FRAME.size == 9
+        assert decodeFrame(frame) == update
+
+
+def test_binary_round_trip_large_seq():
+    update = moveUpdate(2**32 - 1, 6, 0, 2, 42, True)
+    assert decodeFrame(encodeFrame(update)) == update
+
+
+@pytest.mark.parametrize(
+    "last, seq, expected",
+    [(0, 1, "apply"), (5, 6, "apply"), (5, 5, "stale"), (5, 2, "stale"), (5, 7, "gap")],
+)
+def test_seq_gap_detection(last, seq, expected):
+    assert nextSeq(last, seq) == expected
+
+
+def test_missed_update_needs_snapshot():
+    # A client that misses one move asks for a snapshot, then carries on from
+    # the snapshot's seq
+    updates = gameUpdates()
+    last = 0
+    actions = []
+    for update in updates[:2] + updates[3:5]:
+        action = nextSeq(last, update["seq"])
+        actions.append(action)
+        if action == "apply":
+            last = update["seq"]
+    assert actions == ["apply", "apply", "gap", "gap"]
+    board = ConnectFourBitboard()
+    for update in updates[:5]:
+        board.play(update["column"], update["piece"])
+    last = snapshot(board, 5, "room")["seq"]
+    assert nextSeq(last, updates[5]["seq"]) == "apply"
@@ -0,0 +1,58 @@
+# ThreatMap against placing the piece on every empty cell and running the
+# full win scan, which is what the old heuristics did
+import pytest
+
+from connect import ConnectFourBoard
+from test_evaluation import GAMES
+from threats import COLS, ROWS, threatMap
+
+
+def winningCells(board, piece):
+    cells = []
+    for row in range(ROWS):
+        for col in range(COLS):
+            if board.board[row][col] == 0:
+                board.board[row][col] = piece
+                if board.win(piece):
+                    cells.append((row, col))
+                board.board[row][col] = 0
+    return cells
+
+
+def positions():
+    # (board, its ThreatMap) for every position of the random games
+    board = ConnectFourBoard()
+    for game in GAMES:
+        for grid in game:
+            board.set_board(grid)
+            yield board, threatMap(board)
+
+
+@pytest.mark.parametrize("piece", (1, 2))
+def test_count(piece):
+    for board, threats in positions():
+        cells = winningCells(board, piece)
+        assert threats.count(piece) == len(cells), board.get_board()
+
+
+@pytest.mark.parametrize("piece", (1, 2))
+def test_playable_count(piece):
+    for board, threats in positions():
+        playable = [
+            (row, col)
+            for row, col in winningCells(board, piece)
+            if row == ROWS - 1 - board.heights[col]
+        ]
+        assert threats.playableCount(piece) == len(playable), board.get_board()
+
+
+@pytest.mark.parametrize("piece", (1, 2))
+def test_odd_even(piece):
+    for board, threats in positions():
+        cells = winningCells(board, piece)
+        # Rows counted from the bottom starting at 1
+        odd = [cell for cell in cells if (ROWS - cell[0]) % 2 == 1]
+        assert threats.oddEven(piece) == (
+            len(odd),
+            len(cells) - len(odd),
+        ), board.get_board()
@@ -0,0 +1,24 @@
+import pytest
+
+from tournament import eloInterval
+
+
+@pytest.mark.parametrize("result", (0.0, 1.0))
+def test_interval_of_one_sided_scores_has_width(result):
+    # Every game won (or lost): the deviation of the scores is 0, but 8 games
+    # are still far from proof of an infinite difference
+    difference, low, high = eloInterval([result] * 8)
+    assert low < difference or high > difference
+    assert high - low > 500
+
+
+def test_interval_contains_estimate():
+    for scores in ([1.0, 0.0] * 4, [1.0, 0.5, 0.5, 1.0, 0.0, 1.0, 1.0, 0.5] * 5):
+        difference, low, high = eloInterval(scores)
+        assert low < difference < high
+
+
+def test_interval_narrows_with_more_games():
+    _, low, high = eloInterval([1.0, 0.0, 0.5] * 4)
+    _, moreLow, moreHigh = eloInterval([1.0, 0.0, 0.5] * 40)
+    assert moreHigh - moreLow < high - low
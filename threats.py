@@ -0,0 +1,59 @@
+from bitboard import BOARD_MASK, BOTTOM_MASK, COLS, H1, ROWS, boardBits, hasFour
+
+# Rows counted from the bottom starting at 1, as in the usual odd/even threat rules
+ODD_ROWS = BOTTOM_MASK * 0b010101
+EVEN_ROWS = BOTTOM_MASK * 0b101010
+
+
+def winningCells(bits):
+    # Every cell that would complete a four together with the pieces in bits.
+    # Vertically only the cell on top of three can, since gravity keeps the
+    # cells below a piece filled.
+    cells = (bits << 1) & (bits << 2) & (bits << 3)
+    for shift in (H1, H1 - 1, H1 + 1):
+        pair = (bits << shift) & (bits << 2 * shift)
+        cells |= pair & (bits << 3 * shift)
+        cells |= pair & (bits >> shift)
+        pair = (bits >> shift) & (bits >> 2 * shift)
+        cells |= pair & (bits << shift)
+        cells |= pair & (bits >> 3 * shift)
+    return cells & BOARD_MASK
+
+
+def popcount(bits):
+    return bits.bit_count()
+
+
+class ThreatMap:
+    # Empty cells that would complete four for each player, computed with a
+    # handful of shifts instead of trying every cell against a full win scan
+    def __init__(self, bits, mask):
+        self.empty = BOARD_MASK & ~mask
+        # Lowest empty cell of every column that is not full
+        self.playable = (mask + BOTTOM_MASK) & BOARD_MASK
+        self.won = [False, hasFour(bits[1]), hasFour(bits[2])]
+        self.threats = [
+            0,
+            winningCells(bits[1]) & self.empty,
+            winningCells(bits[2]) & self.empty,
+        ]
+
+    def cells(self, piece):
+        # A player who already has four "wins" by playing anywhere
+        return self.empty if self.won[piece] else self.threats[piece]
+
+    def count(self, piece):
+        # Same as ConnectFourBoard.threatAnalysisHeuristic
+        return popcount(self.cells(piece))
+
+    def playableCount(self, piece):
+        # Same as countThreats in try.py: only cells a piece can drop into now
+        return popcount(self.cells(piece) & self.playable)
+
+    def oddEven(self, piece):
+        cells = self.cells(piece)
+        return popcount(cells & ODD_ROWS), popcount(cells & EVEN_ROWS)
+
+
+def threatMap(board):
+    return ThreatMap(*boardBits(board))
@@ -0,0 +1,374 @@
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+import evaluation
+import incremental
+from connect import ConnectFourBitboard, Play
+from mcts import MCTS
+
+# Heuristics by name. The t.py and try.py copies of the engine differ from
+# connect.py only in their weights and in try.py's heuristicEval4, so they are
+# played as parameterized evaluators.
+HEURISTICS = {
+    "eval1": incremental.heuristicEval1,
+    "eval1-t": evaluation.RunsEvaluator((250, 50, 10, 3)),
+    "eval1-try": evaluation.RunsEvaluator((300, 100, 10, 3)),
+    "eval2": evaluation.heuristicEval2,
+    "eval2-t": evaluation.EndsEvaluator(10, 20),
+    "eval3": incremental.heuristicEval3,
+    "eval4": evaluation.FusedEvaluator(),
+    "eval4-try": evaluation.threatBalance,
+}
+
+# Players by name: "minimax" searches to `depth` (and for at most time_ms if
+# given) with a heuristic, "mcts" runs `playouts` playouts (or time_ms)
+CONFIGS = {}
+
+
+def register(name, engine="minimax", **options):
+    if engine not in ("minimax", "mcts"):
+        raise ValueError("engine must be 'minimax' or 'mcts'")
+    if engine == "minimax" and options.get("heuristic") not in HEURISTICS:
+        raise ValueError(f"unknown heuristic {options.get('heuristic')!r}")
+    CONFIGS[name] = dict(options, engine=engine)
+
+
+for _name in HEURISTICS:
+    register(_name, heuristic=_name, depth=4)
+register("mcts", engine="mcts", playouts=2000)
+
+# Engines of a worker process, one per player name
+_engines = {}
+
+
+def swapColors(board):
+    # The board seen from the other side: Play always searches for player 2,
+    # so it plays player 1 on a copy with the pieces swapped
+    swapped = ConnectFourBitboard()
+    swapped.set_board(np.where(board.board == 0, 0, 3 - board.board))
+    return swapped
+
+
+def _engine(name, config):
+    engine = _engines.get(name)
+    if engine is None:
+        if config["engine"] == "mcts":
+            engine = MCTS(rollouts=config.get("rollouts", "numpy"))
+        else:
+            engine = Play(backend="bitboard", ttSizeMb=config.get("tt_size_mb", 4))
+        _engines[name] = engine
+    return engine
+
+
+def _newGame(name, config):
+    # Games are independent: nothing learned in one carries over to the next
+    engine = _engine(name, config)
+    if config["engine"] == "mcts":
+        engine.reset()
+    else:
+        engine.newGame()
+        if engine.transpositionTable is not None:
+            engine.transpositionTable.clear()
+
+
+def chooseMove(name, config, board, piece):
+    # (column, nodes searched) for piece to move on board
+    engine = _engine(name, config)
+    if config["engine"] == "mcts":
+        _, move = engine.search(
+            board, timeBudgetMs=config.get("time_ms"), playouts=config.get("playouts")
+        )
+        return move[1], engine.playouts
+    view = board if piece == 2 else swapColors(board)
+    _, move, stats = engine.iterativeDeepening(
+        view,
+        config.get("time_ms") or math.inf,
+        heuristic_function=HEURISTICS[config["heuristic"]],
+        maxDepth=config["depth"],
+    )
+    return move[1], stats.nodes
+
+
+def openingMoves(seed, index, plies):
+    # The same random opening for both colors of a round, and on every run
+    rng = random.Random(f"{seed}-{index}")
+    while True:
+        board = ConnectFourBitboard()
+        moves = []
+        for ply in range(plies):
+            col = rng.choice(board.getPossibleMoves())
+            board.play(col, 1 if ply % 2 == 0 else 2)
+            moves.append(col)
+            if board.isTerminal():
+                break
+        if not board.isTerminal():
+            return moves
+
+
+def playGame(gameId, first, second, configs, opening):
+    # Runs in a worker. first plays piece 1; the result is first's score.
+    players = {1: first, 2: second}
+    for name in (first, second):
+        _newGame(name, configs[name])
+    board = ConnectFourBitboard()
+    for ply, col in enumerate(opening):
+        board.play(col, 1 if ply % 2 == 0 else 2)
+    moves = []
+    stats = {name: {"moves": 0, "time": 0.0, "nodes": 0} for name in players.values()}
+    while not board.isTerminal():
+        piece = 1 if board.moveCount % 2 == 0 else 2
+        name = players[piece]
+        start = time.perf_counter()
+        col, nodes = chooseMove(name, configs[name], board, piece)
+        stats[name]["time"] += time.perf_counter() - start
+        stats[name]["moves"] += 1
+        stats[name]["nodes"] += nodes
+        board.play(col, piece)
+        moves.append(col)
+    result = 1.0 if board.win(1) else 0.0 if board.win(2) else 0.5
+    return {
+        "type": "game",
+        "id": gameId,
+        "first": first,
+        "second": second,
+        "opening": opening,
+        "moves": moves,
+        "result": result,
+        "stats": stats,
+    }
+
+
+def schedule(names, rounds, seed, plies):
+    # Every pair meets once per round with each color, from the same opening
+    for index in range(rounds):
+        opening = openingMoves(seed, index, plies)
+        for a, b in itertools.combinations(names, 2):
+            yield f"{index}:{a}:{b}", a, b, opening
+            yield f"{index}:{b}:{a}", b, a, opening
+
+
+def readJournal(path, header):
+    # Finished games of an earlier run with the same settings, and the last
+    # line of the journal (None if there is no journal yet)
+    games = []
+    line = None
+    if not os.path.exists(path):
+        return games, line
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by an interrupted run
+                continue
+            if record.get("type") == "tournament":
+                if record != header:
+                    raise ValueError(
+                        f"{path} holds a tournament with other settings; "
+                        "use a new journal"
+                    )
+            elif record.get("type") == "game":
+                games.append(record)
+    return games, line
+
+
+def run(names, rounds, journalPath, workers=None, seed=0, plies=4, progress=None):
+    # Plays every game not in the journal yet and returns all of them
+    configs = {name: CONFIGS[name] for name in names}
+    header = {
+        "type": "tournament",
+        "configs": configs,
+        "seed": seed,
+        "opening_plies": plies,
+    }
+    # More rounds may be added to a journal later, the other settings are fixed
+    games, last = readJournal(journalPath, header)
+    done = {game["id"] for game in games}
+    pending = (
+        game for game in schedule(names, rounds, seed, plies) if game[0] not in done
+    )
+    workers = workers or os.cpu_count()
+
+    with open(journalPath, "a") as journal:
+        if last is None:
+            journal.write(json.dumps(header) + "\n")
+        elif not last.endswith("\n"):
+            journal.write("\n")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Keep a few games per worker in flight instead of queueing them all
+            running = set()
+            while True:
+                for gameId, first, second, opening in itertools.islice(
+                    pending, 2 * workers - len(running)
+                ):
+                    running.add(
+                        executor.submit(
+                            playGame, gameId, first, second, configs, opening
+                        )
+                    )
+                if not running:
+                    break
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    game = future.result()
+                    journal.write(json.dumps(game) + "\n")
+                    journal.flush()
+                    games.append(game)
+                    if progress:
+                        progress(game, len(games))
+    return games
+
+
+def elo(score):
+    # Elo difference that gives an expected score of `score`
+    score = min(max(score, 0.001), 0.999)
+    return -400 * math.log10(1 / score - 1)
+
+
+def eloInterval(scores, z=1.96):
+    # (Elo difference, low, high) with a 95% interval, from per-game scores.
+    # The interval is the Wilson interval of the score, which keeps a sensible
+    # width when every game was won (or lost), unlike mean +- z deviations.
+    n = len(scores)
+    mean = sum(scores) / n
+    center = (mean + z * z / (2 * n)) / (1 + z * z / n)
+    half = z / (1 + z * z / n) * math.sqrt(mean * (1 - mean) / n + z * z / (4 * n * n))
+    return elo(mean), elo(center - half), elo(center + half)
+
+
+def report(games, names):
+    # W/D/L, ratings and costs per player, and the result of every pairing
+    scores = {name: [] for name in names}
+    opponents = {name: [] for name in names}
+    pairs = {}
+    cost = {name: {"moves": 0, "time": 0.0, "nodes": 0} for name in names}
+    for game in games:
+        first, second, result = game["first"], game["second"], game["result"]
+        scores[first].append(result)
+        scores[second].append(1 - result)
+        opponents[first].append(second)
+        opponents[second].append(first)
+        a, b = sorted((first, second), key=names.index)
+        pairs.setdefault((a, b), []).append(result if first == a else 1 - result)
+        for name, stats in game["stats"].items():
+            for field in cost[name]:
+                cost[name][field] += stats[field]
+
+    # Ratings r solve r[i] - mean(r of i's opponents) = elo(score of i), with
+    # the ratings centered on 0
+    played = [name for name in names if scores[name]]
+    index = {name: i for i, name in enumerate(played)}
+    rows = []
+    targets = []
+    for name in played:
+        row = np.zeros(len(played))
+        row[index[name]] = 1
+        for opponent in opponents[name]:
+            row[index[opponent]] -= 1 / len(opponents[name])
+        rows.append(row)
+        targets.append(elo(sum(scores[name]) / len(scores[name])))
+    rows.append(np.ones(len(played)))
+    targets.append(0)
+    ratings = np.linalg.lstsq(np.array(rows), np.array(targets), rcond=None)[0]
+
+    players = {}
+    for name in played:
+        wins = scores[name].count(1.0)
+        draws = scores[name].count(0.5)
+        performance, low, high = eloInterval(scores[name])
+        rating = float(ratings[index[name]])
+        stats = cost[name]
+        players[name] = {
+            "config": CONFIGS[name],
+            "games": len(scores[name]),
+            "wins": wins,
+            "draws": draws,
+            "losses": len(scores[name]) - wins - draws,
+            "score": sum(scores[name]) / len(scores[name]),
+            "elo": rating,
+            "elo_low": rating + low - performance,
+            "elo_high": rating + high - performance,
+            "ms_per_move": (
+                stats["time"] * 1000 / stats["moves"] if stats["moves"] else 0.0
+            ),
+            "nodes_per_second": (
+                stats["nodes"] / stats["time"] if stats["time"] else 0.0
+            ),
+        }
+    matchups = {}
+    for (a, b), results in pairs.items():
+        difference, low, high = eloInterval(results)
+        wins = results.count(1.0)
+        draws = results.count(0.5)
+        matchups[f"{a} vs {b}"] = {
+            "games": len(results),
+            "wins": wins,
+            "draws": draws,
+            "losses": len(results) - wins - draws,
+            "elo_difference": difference,
+            "elo_low": low,
+            "elo_high": high,
+        }
+    return {"games": len(games), "players": players, "pairs": matchups}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Round-robin tournament between engine configurations"
+    )
+    parser.add_argument(
+        "players", nargs="*", help=f"players to enter (default all): {list(CONFIGS)}"
+    )
+    parser.add_argument(
+        "--rounds", type=int, default=10, help="openings; each pair plays 2 per round"
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--opening-plies", type=int, default=4)
+    parser.add_argument(
+        "--journal",
+        default="tournament.jsonl",
+        help="finished games; an interrupted run resumes from it",
+    )
+    parser.add_argument("--output", default="tournament.json")
+    args = parser.parse_args()
+
+    names = args.players or list(CONFIGS)
+    for name in names:
+        if name not in CONFIGS:
+            parser.error(f"unknown player {name!r}")
+    total = args.rounds * len(names) * (len(names) - 1)
+
+    def progress(game, count):
+        print(f"{count}/{total} {game['first']} - {game['second']}: {game['result']}")
+
+    games = run(
+        names,
+        args.rounds,
+        args.journal,
+        args.workers,
+        args.seed,
+        args.opening_plies,
+        progress,
+    )
+    result = report(games, names)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    ranking = sorted(result["players"].items(), key=lambda item: -item[1]["elo"])
+    for name, player in ranking:
+        print(
+            f"{name:>10}: {player['elo']:+7.1f} "
+            f"[{player['elo_low']:+.0f}, {player['elo_high']:+.0f}]  "
+            f"+{player['wins']} ={player['draws']} -{player['losses']}  "
+            f"{player['ms_per_move']:.1f} ms/move, "
+            f"{player['nodes_per_second'] / 1000:.1f} K nodes/s"
+        )
@@ -0,0 +1,96 @@
+import random
+import zlib
+from functools import lru_cache
+
+# Bound types stored with each entry
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Fixed seed so every process computes the same keys for the same position
+_rng = random.Random(0x436F6E34)
+ZOBRIST = [
+    [[_rng.getrandbits(64) for col in range(7)] for row in range(6)]
+    for piece in range(3)
+]
+ZOBRIST[0] = [[0] * 7 for row in range(6)]
+SIDE_KEY = _rng.getrandbits(64)
+
+# Rough cost of one stored entry in CPython: the tuple plus its int/float items
+ENTRY_BYTES = 120
+
+
+@lru_cache(maxsize=None)
+def heuristicKey(heuristic_function):
+    # Values from different heuristics must never be mixed, so the heuristic
+    # is folded into the key. crc32 keeps this stable across processes.
+    # Configurable evaluators provide their own `key` string.
+    name = getattr(heuristic_function, "key", None) or "%s.%s" % (
+        getattr(heuristic_function, "__module__", ""),
+        getattr(
+            heuristic_function, "__qualname__", type(heuristic_function).__qualname__
+        ),
+    )
+    return (zlib.crc32(name.encode()) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+
+
+class TranspositionTable:
+    def __init__(self, sizeMb=16, replacement="depth"):
+        if replacement not in ("depth", "always"):
+            raise ValueError("replacement must be 'depth' or 'always'")
+        # Power-of-two slot count that fits the budget, so indexing is a mask
+        slots = max(1, int(sizeMb * 2**20) // ENTRY_BYTES)
+        self.size = 1 << (slots.bit_length() - 1)
+        self.mask = self.size - 1
+        self.replacement = replacement
+        self.entries = [None] * self.size
+        self.resetStats()
+
+    def resetStats(self):
+        self.probes = 0
+        self.hits = 0
+        self.collisions = 0
+        self.stores = 0
+        self.overwrites = 0
+        self.rejected = 0
+
+    def clear(self):
+        self.entries = [None] * self.size
+        self.resetStats()
+
+    def probe(self, key):
+        # Returns (key, depth, flag, value, move) or None
+        self.probes += 1
+        entry = self.entries[key & self.mask]
+        if entry is None:
+            return None
+        if entry[0] != key:
+            # Slot is held by a different position
+            self.collisions += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def store(self, key, depth, flag, value, move):
+        index = key & self.mask
+        old = self.entries[index]
+        if old is not None and old[0] != key:
+            if self.replacement == "depth" and old[1] > depth:
+                self.rejected += 1
+                return
+            self.overwrites += 1
+        self.entries[index] = (key, depth, flag, value, move)
+        self.stores += 1
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "replacement": self.replacement,
+            "probes": self.probes,
+            "hits": self.hits,
+            "collisions": self.collisions,
+            "stores": self.stores,
+            "overwrites": self.overwrites,
+            "rejected": self.rejected,
+            "hit_rate": self.hits / self.probes if self.probes else 0.0,
+        }
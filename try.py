@@ -2,12 +2,16 @@ import numpy as np
 import random
 import copy
 
+from threats import threatMap
+
 
 class ConnectFourBoard:
     def __init__(self):
         self.rows = 6
         self.cols = 7
         self.board = np.zeros((self.rows, self.cols), dtype=int)
+        self.heights = [0] * self.cols
+        self.moveHistory = []
 
     def drawBoard(self):
         for row in self.board:
@@ -24,6 +28,22 @@ class ConnectFourBoard:
 
     def makeMove(self, row, col, piece):
         self.board[row][col] = piece
+        self.heights[col] = self.rows - row if piece else self.rows - 1 - row
+
+    def play(self, col, piece):
+        # Drop a piece in col and return the row it landed on
+        if not 0 <= col < self.cols or self.heights[col] >= self.rows:
+            raise ValueError(f"Column {col} is not a legal move")
+        row = self.rows - 1 - self.heights[col]
+        self.board[row, col] = piece
+        self.heights[col] += 1
+        self.moveHistory.append((row, col))
+        return row
+
+    def undo(self):
+        row, col = self.moveHistory.pop()
+        self.board[row, col] = 0
+        self.heights[col] -= 1
 
     def win(self, piece):
         # Check for a win horizontally
@@ -186,22 +206,13 @@ class ConnectFourBoard:
         return own_threats - opponent_threats
 
     def countThreats(self, piece):
-        threats = 0
-        for col in range(self.cols):
-            row = self.findEmptyRow(col)
-            if row is not None:
-                # Check for threats in the current position
-                self.board[row][col] = piece
-                if self.win(piece):
-                    threats += 1
-                self.board[row][col] = 0  # Reset the board to the original state
-        return threats
+        # Columns where dropping the piece now would make four
+        return threatMap(self).playableCount(piece)
 
     def findEmptyRow(self, col):
-        for row in range(self.rows - 1, -1, -1):
-            if self.board[row][col] == 0:
-                return row
-        return None
+        if self.heights[col] == self.rows:
+            return None
+        return self.rows - 1 - self.heights[col]
 
     # NOOOO
     def heuristicEval5(self, piece):
@@ -230,17 +241,14 @@ class Play:
             print("Invalid move. Try again.")
             self.humanTurn()
         else:
-            row = max(
-                [r for r in range(self.board.rows) if self.board.board[r][col] == 0]
-            )
-            self.board.makeMove(row, col, self.player1_piece)
+            self.board.play(col, self.player1_piece)
 
     def computerTurn(self, player_piece, player_heuristic):
         print("Player's turn!!!")
         _, move = self.minimaxAlphaBetaPruning(
             self.board, 5, float("-inf"), float("inf"), True, player_heuristic
         )
-        self.board.makeMove(move[0], move[1], player_piece)
+        self.board.play(move[1], player_piece)
 
     def play(self):
         while not self.board.gameOver():
@@ -278,12 +286,11 @@ class Play:
             maxEval = float("-inf")
             bestMove = None
             for col in possible_moves:
-                row = max([r for r in range(board.rows) if board.board[r][col] == 0])
-                board.makeMove(row, col, 2)
+                row = board.play(col, 2)
                 eval, _ = self.minimaxAlphaBetaPruning(
                     board, depth - 1, alpha, beta, False, heuristic_function
                 )
-                board.makeMove(row, col, 0)
+                board.undo()
                 if eval > maxEval:
                     maxEval = eval
                     bestMove = (row, col)
@@ -295,12 +302,11 @@ class Play:
             minEval = float("inf")
             bestMove = None
             for col in possible_moves:
-                row = max([r for r in range(board.rows) if board.board[r][col] == 0])
-                board.makeMove(row, col, 1)
+                row = board.play(col, 1)
                 eval, _ = self.minimaxAlphaBetaPruning(
                     board, depth - 1, alpha, beta, True, heuristic_function
                 )
-                board.makeMove(row, col, 0)
+                board.undo()
                 if eval < minEval:
                     minEval = eval
                     bestMove = (row, col)
@@ -315,10 +321,7 @@ class Play:
         best_move = None
 
         for col in self.board.getPossibleMoves():
-            row = max(
-                [r for r in range(self.board.rows) if self.board.board[r][col] == 0]
-            )
-            self.board.makeMove(row, col, current_player)
+            row = self.board.play(col, current_player)
             total_score = 0
 
             for _ in range(simulations):
@@ -331,7 +334,7 @@ class Play:
                 best_score = average_score
                 best_move = (row, col)
 
-            self.board.makeMove(row, col, 0)  # Undo the move for next iteration
+            self.board.undo()  # Undo the move for next iteration
 
         return best_move
 
@@ -339,10 +342,7 @@ class Play:
         while not board.gameOver():
             possible_moves = board.getPossibleMoves()
             random_move = random.choice(possible_moves)
-            row = max(
-                [r for r in range(board.rows) if board.board[r][random_move] == 0]
-            )
-            board.makeMove(row, random_move, current_player)
+            board.play(random_move, current_player)
             current_player = 3 - current_player  # Switch player (1 to 2, or 2 to 1)
         if board.win(2):  # Assuming computer is player 2
             return 1  # Computer wins